@@ -95,13 +95,40 @@ function startPythonBackend() {
       cwd: path.join(__dirname, '..')
     });
 
+    // Unsolicited events (e.g. incoming calls) are forwarded to the renderer;
+    // command responses are matched by the 'python-command' handler below
+    let eventBuffer = '';
     pythonProcess.stdout.on('data', (data) => {
-      const output = data.toString().trim();
-      if (output) {
+      eventBuffer += data.toString();
+      const lines = eventBuffer.split('\n');
+      eventBuffer = lines.pop();
+
+      for (const rawLine of lines) {
+        const output = rawLine.trim();
+        if (!output) continue;
+
+        if (output.startsWith('{') && output.includes('"event"')) {
+          try {
+            const message = JSON.parse(output);
+            if (message.type === 'event') {
+              if (mainWindow && !mainWindow.isDestroyed()) {
+                mainWindow.webContents.send('python-event', message);
+              }
+              continue;
+            }
+          } catch (parseError) {
+            // Not an event; fall through and log it
+          }
+        }
         console.log(`Python: ${output}`);
       }
     });
 
+    // A fresh bridge starts without event subscriptions; let the renderer subscribe again
+    if (mainWindow && !mainWindow.isDestroyed()) {
+      mainWindow.webContents.send('python-event', { type: 'event', event: 'bridge_started' });
+    }
+
     pythonProcess.stderr.on('data', (data) => {
       const errorOutput = data.toString().trim();
       if (errorOutput) {
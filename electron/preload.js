@@ -20,6 +20,8 @@ contextBridge.exposeInMainWorld('electronAPI', {
   // Events
   onWindowStateChange: (callback) => 
     ipcRenderer.on('window-state-changed', callback),
+  onPythonEvent: (callback) =>
+    ipcRenderer.on('python-event', callback),
   
   removeAllListeners: (channel) => 
     ipcRenderer.removeAllListeners(channel)
@@ -7,22 +7,78 @@ Cross-platform P2P messaging with end-to-end encryption
 
 import os
 import sys
+import asyncio
 import argparse
 import getpass
 import socket # For _get_local_ip
-from typing import List, Tuple
+import threading
+import time
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
 from datetime import datetime
 
 from src.models import User, Contact, Connection
-from src.crypto_manager import CryptoManager, ENCRYPTION_AVAILABLE
-from src.user_manager import UserManager
-from src.contact_manager import ContactManager
-from src.connection_manager import ConnectionManager
+
+# Optional: prompt_toolkit keeps the input line intact while peer messages are printed
+try:
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.patch_stdout import patch_stdout
+    PROMPT_TOOLKIT_AVAILABLE = True
+except ImportError:
+    PROMPT_TOOLKIT_AVAILABLE = False
+
+# Messages kept in the session chat history before the oldest are dropped
+CHAT_HISTORY_LIMIT = 10000
+
+# How long a probed local IP address is reused before probing again
+LOCAL_IP_TTL = 30.0
+
+BANNER = f"{'=' * 50}\n[SECURE] WhisperLink - Secure P2P Messenger\n{'=' * 50}\n"
+
+_NO_ENCRYPTION_WARNING = (
+    "\n⚠️  WARNING: PyNaCl not available. Using mock encryption for demo.\n"
+    "   Install PyNaCl for real security: pip install PyNaCl\n"
+)
+
+# Static part of the main menu, rendered once at import time
+_MENU_TAIL = "\n".join([
+    "=" * 50,
+    "",
+    "MAIN MENU:",
+    "1. Start listening for connections",
+    "2. Connect to a peer",
+    "3. Manage contacts",
+    "4. View connections",
+    "5. Chat with connected peer",
+    "6. Export my public info",
+    "7. Logout",
+    "8. Exit",
+    "",
+]) + "\n"
+
+def _set_future_result(future: asyncio.Future, result):
+    if not future.done():
+        future.set_result(result)
+
+def _set_future_exception(future: asyncio.Future, exc: BaseException):
+    if not future.done():
+        future.set_exception(exc)
 
 class WhisperLinkCLI:
     """Main CLI interface for WhisperLink"""
     
     def __init__(self):
+        # Imported here so `--help`/`--version` never load PyNaCl, aiohttp or websockets
+        from src.crypto_manager import ENCRYPTION_AVAILABLE
+        from src.user_manager import UserManager
+        from src.contact_manager import ContactManager
+        from src.connection_manager import ConnectionManager
+        
+        self._banner = BANNER
+        if not ENCRYPTION_AVAILABLE:
+            self._banner += _NO_ENCRYPTION_WARNING
         self.user_manager = UserManager()
         self.contact_manager = ContactManager()
         self.connection_manager = ConnectionManager(self.user_manager, self.contact_manager)
@@ -32,69 +88,168 @@ class WhisperLinkCLI:
         self.connection_manager.add_message_handler(self._handle_received_message)
         
         # Chat history for current session
-        self.chat_history: List[Tuple[str, str, str, str]] = []  # (peer_id, username, message, timestamp)
+        self.chat_history: Deque[Tuple[str, str, str, float]] = deque(maxlen=CHAT_HISTORY_LIMIT)  # (peer_id, username, message, epoch seconds)
+        # Per-peer message sequence numbers, so a chat only touches its own messages.
+        # A message's offset in chat_history is its seq minus _history_base, the seq of the oldest entry.
+        self.chat_index: Dict[str, Deque[int]] = {}
+        self._history_base = 0
+        
+        # (ip, monotonic timestamp) of the last local IP probe
+        self._local_ip_cache: Tuple[str, float] = ("", 0.0)
+        
+        self._prompt_session = None
+        
+        # Menu option -> handler, one table per menu
+        self._login_dispatch = {"1": self._login, "2": self._register}
+        self._menu_dispatch = {
+            "1": self._start_listening_menu,
+            "2": self._connect_to_peer_menu,
+            "3": self._manage_contacts_menu,
+            "4": self._view_connections_menu,
+            "5": self._chat_menu,
+            "6": self._export_public_info,
+            "7": self._logout,
+            "8": self._exit,
+        }
+        self._contacts_dispatch = {
+            "1": self._add_contact_menu,
+            "2": self._remove_contact_menu,
+            "3": self._view_contact_details_menu,
+        }
+        # Prompt text of a plain input() currently waiting, so incoming messages can redraw it
+        self._pending_prompt: Optional[str] = None
+    
+    async def _handle_received_message(self, peer_id: str, username: str, message: str, timestamp: str,
+                                       is_group: bool = False, group_id: str = None, group_name: str = None):
+        """Handle received messages, direct or group"""
+        try:
+            # Parse the peer's ISO timestamp once; history keeps epoch seconds
+            sent_at = datetime.fromisoformat(timestamp).timestamp()
+        except (TypeError, ValueError):
+            sent_at = time.time()
+        self._record_chat_message(peer_id, username, message, sent_at)
+        if is_group:
+            line = f"[GROUP {group_name or group_id or 'unknown'}] From {username}: {message}"
+        else:
+            line = f"[MESSAGE] From {username}: {message}"
+        if self._pending_prompt is not None and sys.stdout.isatty():
+            # Clear the prompt line, print the message above it, then redraw the prompt
+            sys.stdout.write(f"\r\x1b[K{line}\n{self._pending_prompt}")
+            sys.stdout.flush()
+        else:
+            # Under prompt_toolkit, patch_stdout() renders this above the active prompt
+            print(f"\n{line}")
     
-    def _handle_received_message(self, peer_id: str, username: str, message: str, timestamp: str):
-        """Handle received messages"""
+    def _record_chat_message(self, peer_id: str, username: str, message: str, timestamp: float):
+        """Append a message to the session history and index it by peer"""
+        if len(self.chat_history) == self.chat_history.maxlen:
+            # The append below evicts the oldest message; drop its seq from that peer's index
+            evicted_peer = self.chat_history[0][0]
+            evicted_seqs = self.chat_index[evicted_peer]
+            evicted_seqs.popleft()
+            if not evicted_seqs:
+                del self.chat_index[evicted_peer]
+            self._history_base += 1
+        
         self.chat_history.append((peer_id, username, message, timestamp))
-        print(f"\n[MESSAGE] From {username}: {message}")
-        print("Press Enter to continue...")
+        seq = self._history_base + len(self.chat_history) - 1
+        self.chat_index.setdefault(peer_id, deque()).append(seq)
+    
+    def _peer_messages(self, peer_id: str, limit: int = None) -> List[Tuple[str, str, str, float]]:
+        """Return the session history for one peer, optionally only the last `limit` messages"""
+        seqs = self.chat_index.get(peer_id, ())
+        if limit is not None and len(seqs) > limit:
+            seqs = reversed(list(islice(reversed(seqs), limit)))
+        base = self._history_base
+        return [self.chat_history[seq - base] for seq in seqs]
     
     def start(self):
         """Start the WhisperLink CLI"""
-        print("=" * 50)
-        print("[SECURE] WhisperLink - Secure P2P Messenger")
-        print("=" * 50)
-        print()
-        
-        if not ENCRYPTION_AVAILABLE:
-            print("⚠️  WARNING: PyNaCl not available. Using mock encryption for demo.")
-            print("   Install PyNaCl for real security: pip install PyNaCl")
-            print()
+        try:
+            asyncio.run(self._amain())
+        except KeyboardInterrupt:
+            print("\n\nShutting down WhisperLink...")
+    
+    async def _amain(self):
+        """Run the CLI on a single event loop shared with every peer connection"""
+        print(self._banner)
         
         # Check if user is logged in
-        if not self._login_flow():
+        if not await self._login_flow():
             return
         
-        # Main menu loop
-        while self.running:
+        try:
+            # Main menu loop
+            while self.running:
+                try:
+                    self._show_main_menu()
+                    choice = (await self._ainput("Enter your choice: ")).strip()
+                    await self._handle_menu_choice(choice)
+                except Exception as e:
+                    print(f"Error: {e}")
+                    await self._ainput("Press Enter to continue...")
+        finally:
+            # Runs on normal exit as well as when Ctrl+C cancels the main task
+            await self._cleanup()
+    
+    async def _ainput(self, prompt: str = "") -> str:
+        """Read a line from stdin without blocking the event loop"""
+        if PROMPT_TOOLKIT_AVAILABLE and sys.stdin.isatty() and sys.stdout.isatty():
+            if self._prompt_session is None:
+                self._prompt_session = PromptSession()
+            with patch_stdout():
+                return await self._prompt_session.prompt_async(prompt)
+        
+        self._pending_prompt = prompt
+        try:
+            return await self._run_blocking_prompt(input, prompt)
+        finally:
+            self._pending_prompt = None
+    
+    async def _agetpass(self, prompt: str = "Password: ") -> str:
+        """Read a password from the terminal without blocking the event loop"""
+        return await self._run_blocking_prompt(getpass.getpass, prompt)
+    
+    async def _run_blocking_prompt(self, func, prompt: str) -> str:
+        # A daemon thread (rather than the default executor) so an abandoned prompt
+        # never holds up interpreter shutdown after Ctrl+C
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        
+        def read():
             try:
-                self._show_main_menu()
-                choice = input("Enter your choice: ").strip()
-                self._handle_menu_choice(choice)
-            except KeyboardInterrupt:
-                print("\n\nShutting down WhisperLink...")
-                self._cleanup()
-                break
-            except Exception as e:
-                print(f"Error: {e}")
-                input("Press Enter to continue...")
+                result = func(prompt)
+            except BaseException as e:
+                loop.call_soon_threadsafe(_set_future_exception, future, e)
+            else:
+                loop.call_soon_threadsafe(_set_future_result, future, result)
+        
+        threading.Thread(target=read, daemon=True).start()
+        return await future
     
-    def _login_flow(self) -> bool:
+    async def _login_flow(self) -> bool:
         """Handle user login/registration"""
         while True:
             print("1. Login")
             print("2. Register new account")  
             print("3. Exit")
             
-            choice = input("Choose option (1-3): ").strip()
+            choice = (await self._ainput("Choose option (1-3): ")).strip()
             
-            if choice == "1":
-                if self._login():
-                    return True
-            elif choice == "2":
-                if self._register():
-                    return True
-            elif choice == "3":
+            if choice == "3":
                 return False
+            handler = self._login_dispatch.get(choice)
+            if handler:
+                if await handler():
+                    return True
             else:
                 print("Invalid choice. Please try again.\n")
     
-    def _login(self) -> bool:
+    async def _login(self) -> bool:
         """Login user"""
         print("\n--- Login ---")
-        username = input("Username: ").strip()
-        password = getpass.getpass("Password: ")
+        username = (await self._ainput("Username: ")).strip()
+        password = await self._agetpass("Password: ")
         
         if self.user_manager.login(username, password):
             user = self.user_manager.get_current_user()
@@ -106,16 +261,21 @@ class WhisperLinkCLI:
             print("[ERROR] Invalid username or password.\n")
             return False
     
-    def _register(self) -> bool:
+    async def _register(self) -> bool:
         """Register new user"""
         print("\n--- Registration ---")
-        username = input("Choose username: ").strip()
+        username = (await self._ainput("Choose username: ")).strip()
         if not username:
             print("Username cannot be empty.\n")
             return False
         
-        password = getpass.getpass("Choose password: ")
-        password_confirm = getpass.getpass("Confirm password: ")
+        # Bail out before the password prompts and key generation
+        if self.user_manager.username_exists(username):
+            print(f"[ERROR] Registration failed: Username '{username}' already exists\n")
+            return False
+        
+        password = await self._agetpass("Choose password: ")
+        password_confirm = await self._agetpass("Confirm password: ")
         
         if password != password_confirm:
             print("[ERROR] Passwords don't match.\n")
@@ -141,54 +301,32 @@ class WhisperLinkCLI:
         user = self.user_manager.get_current_user()
         active_connections = self.connection_manager.get_active_connections()
         
-        print("\n" + "=" * 50)
-        print(f"User: {user.username} | User ID: {user.user_id}")
-        print(f"Active Connections: {len(active_connections)}")
+        header = (
+            f"\n{'=' * 50}\n"
+            f"User: {user.username} | User ID: {user.user_id}\n"
+            f"Active Connections: {len(active_connections)}\n"
+        )
         if self.connection_manager.listening:
-            print(f"Listening on: localhost:{self.connection_manager.server_port}")
-        print("=" * 50)
-        print()
-        print("MAIN MENU:")
-        print("1. Start listening for connections")
-        print("2. Connect to a peer")
-        print("3. Manage contacts")
-        print("4. View connections")
-        print("5. Chat with connected peer")
-        print("6. Export my public info")
-        print("7. Logout")
-        print("8. Exit")
-        print()
+            header += f"Listening on: localhost:{self.connection_manager.server_port}\n"
+        sys.stdout.write(header + _MENU_TAIL)
     
-    def _handle_menu_choice(self, choice: str):
+    async def _handle_menu_choice(self, choice: str):
         """Handle menu choice"""
-        if choice == "1":
-            self._start_listening_menu()
-        elif choice == "2":
-            self._connect_to_peer_menu()
-        elif choice == "3":
-            self._manage_contacts_menu()
-        elif choice == "4":
-            self._view_connections_menu()
-        elif choice == "5":
-            self._chat_menu()
-        elif choice == "6":
-            self._export_public_info()
-        elif choice == "7":
-            self._logout()
-        elif choice == "8":
-            self._exit()
+        handler = self._menu_dispatch.get(choice)
+        if handler:
+            await handler()
         else:
             print("Invalid choice. Please try again.")
     
-    def _start_listening_menu(self):
+    async def _start_listening_menu(self):
         """Start listening for connections menu"""
         print("\n--- Start Listening for Connections ---")
         
         if self.connection_manager.listening:
             print("Already listening for connections.")
-            choice = input("Stop listening? (y/n): ").lower()
+            choice = (await self._ainput("Stop listening? (y/n): ")).lower()
             if choice == 'y':
-                self.connection_manager.stop_listening()
+                await self.connection_manager.stop_listening()
                 print("[SUCCESS] Stopped listening for connections.")
             return
         
@@ -196,11 +334,13 @@ class WhisperLinkCLI:
         print("2. Listen with tunnel (slower, IP hidden)")
         print("3. Cancel")
         
-        choice = input("Choose option (1-3): ").strip()
+        choice = (await self._ainput("Choose option (1-3): ")).strip()
         
         if choice == "1":
-            success, info = self.connection_manager.start_listening(use_tunnel=False)
+            success, info = await self.connection_manager.start_listening(use_tunnel=False)
             if success:
+                # The interface in use may have changed since the last probe
+                self._local_ip_cache = ("", 0.0)
                 print(f"[SUCCESS] Listening for connections on: {info}")
                 print("Share this address with peers to connect directly.")
             else:
@@ -208,16 +348,17 @@ class WhisperLinkCLI:
         
         elif choice == "2":
             print("Starting tunnel... (this may take a moment)")
-            success, info = self.connection_manager.start_listening(use_tunnel=True)
+            success, info = await self.connection_manager.start_listening(use_tunnel=True)
             if success:
+                self._local_ip_cache = ("", 0.0)
                 print(f"[SUCCESS] Listening for connections via tunnel: {info}")
                 print("Share this URL with peers to connect securely.")
             else:
                 print(f"[ERROR] Failed to start listening: {info}")
         
-        input("\nPress Enter to continue...")
+        await self._ainput("\nPress Enter to continue...")
     
-    def _connect_to_peer_menu(self):
+    async def _connect_to_peer_menu(self):
         """Connect to peer menu"""
         print("\n--- Connect to a Peer ---")
         
@@ -225,13 +366,14 @@ class WhisperLinkCLI:
         contacts = self.contact_manager.list_contacts()
         if contacts:
             print("Available contacts:")
+            connected_ids = self.connection_manager.connections_snapshot()
             for i, contact in enumerate(contacts, 1):
-                status = "🟢 Online" if contact.user_id in self.connection_manager.connections else "⚫ Offline"
+                status = "🟢 Online" if contact.user_id in connected_ids else "⚫ Offline"
                 print(f"{i}. {contact.username} ({contact.user_id}) - {status}")
             print(f"{len(contacts) + 1}. Connect to new peer")
             print(f"{len(contacts) + 2}. Cancel")
             
-            choice = input(f"Choose option (1-{len(contacts) + 2}): ").strip()
+            choice = (await self._ainput(f"Choose option (1-{len(contacts) + 2}): ")).strip()
             
             try:
                 choice_num = int(choice)
@@ -241,41 +383,41 @@ class WhisperLinkCLI:
                         print("Already connected to this peer.")
                     else:
                         print(f"Connecting to {contact.username}...")
-                        if self.connection_manager.connect_to_peer(contact.user_id):
+                        if await self.connection_manager.connect_to_peer(contact.user_id):
                             print("[SUCCESS] Successfully connected!")
                         else:
                             print("[ERROR] Failed to connect.")
                 elif choice_num == len(contacts) + 1:
-                    self._connect_to_new_peer()
+                    await self._connect_to_new_peer()
             except ValueError:
                 print("Invalid choice.")
         else:
             print("No contacts available.")
-            self._connect_to_new_peer()
+            await self._connect_to_new_peer()
         
-        input("\nPress Enter to continue...")
+        await self._ainput("\nPress Enter to continue...")
     
-    def _connect_to_new_peer(self):
+    async def _connect_to_new_peer(self):
         """Connect to a new peer not in contacts"""
         print("\n--- Connect to New Peer ---")
-        peer_id = input("Enter peer's User ID: ").strip()
-        username = input("Enter peer's username: ").strip()
-        public_key = input("Enter peer's public key: ").strip()
+        peer_id = (await self._ainput("Enter peer's User ID: ")).strip()
+        username = (await self._ainput("Enter peer's username: ")).strip()
+        public_key = (await self._ainput("Enter peer's public key: ")).strip()
         
         print("Connection type:")
         print("1. Direct IP connection")
         print("2. Tunnel connection") 
         
-        conn_choice = input("Choose (1-2): ").strip()
+        conn_choice = (await self._ainput("Choose (1-2): ")).strip()
         
         if conn_choice == "1":
-            address = input("Enter IP address (host:port): ").strip()
+            address = (await self._ainput("Enter IP address (host:port): ")).strip()
             
             if self.contact_manager.add_contact(peer_id, username, public_key, "direct", address):
                 print("Contact added.")
                 
                 print("Connecting...")
-                if self.connection_manager.connect_to_peer(peer_id):
+                if await self.connection_manager.connect_to_peer(peer_id):
                     print("[SUCCESS] Successfully connected!")
                 else:
                     print("[ERROR] Failed to connect.")
@@ -283,32 +425,33 @@ class WhisperLinkCLI:
                 print("Contact already exists.")
         
         elif conn_choice == "2":
-            tunnel_url = input("Enter tunnel URL: ").strip()
+            tunnel_url = (await self._ainput("Enter tunnel URL: ")).strip()
             
             if self.contact_manager.add_contact(peer_id, username, public_key, "tunnel", tunnel_url=tunnel_url):
                 print("Contact added.")
                 print("Connecting via tunnel...")
-                if self.connection_manager.connect_to_peer(peer_id):
+                if await self.connection_manager.connect_to_peer(peer_id):
                     print("[SUCCESS] Successfully connected via tunnel!")
                 else:
                     print("[ERROR] Failed to connect via tunnel.")
             else:
                 print("Contact already exists.")
     
-    def _manage_contacts_menu(self):
+    async def _manage_contacts_menu(self):
         """Manage contacts menu"""
         while True:
             print("\n--- Manage Contacts ---")
             contacts = self.contact_manager.list_contacts()
             
             if contacts:
-                print("Your contacts:")
+                connected_ids = self.connection_manager.connections_snapshot()
+                lines = ["Your contacts:"]
                 for i, contact in enumerate(contacts, 1):
-                    conn_status = "🟢 Connected" if contact.user_id in self.connection_manager.connections else "⚫ Not connected"
+                    conn_status = "🟢 Connected" if contact.user_id in connected_ids else "⚫ Not connected"
                     last_seen = contact.last_seen or "Never"
-                    print(f"{i}. {contact.username} ({contact.user_id[:8]}...)")
-                    print(f"   Type: {contact.connection_type} | {conn_status} | Last seen: {last_seen}")
-                print()
+                    lines.append(f"{i}. {contact.username} ({contact.short_id}...)")
+                    lines.append(f"   Type: {contact.connection_type} | {conn_status} | Last seen: {last_seen}")
+                sys.stdout.write("\n".join(lines) + "\n\n")
             else:
                 print("No contacts found.")
             
@@ -318,48 +461,45 @@ class WhisperLinkCLI:
             print("3. View contact details")
             print("4. Back to main menu")
             
-            choice = input("Choose option (1-4): ").strip()
+            choice = (await self._ainput("Choose option (1-4): ")).strip()
             
-            if choice == "1":
-                self._add_contact_menu()
-            elif choice == "2":
-                self._remove_contact_menu()
-            elif choice == "3":
-                self._view_contact_details_menu()
-            elif choice == "4":
+            if choice == "4":
                 break
+            handler = self._contacts_dispatch.get(choice)
+            if handler:
+                await handler()
             else:
                 print("Invalid choice.")
     
-    def _add_contact_menu(self):
+    async def _add_contact_menu(self):
         """Add new contact"""
         print("\n--- Add New Contact ---")
         
-        user_id = input("User ID: ").strip()
-        username = input("Username: ").strip()
-        public_key = input("Public Key: ").strip()
+        user_id = (await self._ainput("User ID: ")).strip()
+        username = (await self._ainput("Username: ")).strip()
+        public_key = (await self._ainput("Public Key: ")).strip()
         
         print("Connection type:")
         print("1. Direct IP")
         print("2. Tunnel")
         
-        conn_choice = input("Choose (1-2): ").strip()
+        conn_choice = (await self._ainput("Choose (1-2): ")).strip()
         
         if conn_choice == "1":
-            address = input("IP Address (host:port): ").strip()
+            address = (await self._ainput("IP Address (host:port): ")).strip()
             if self.contact_manager.add_contact(user_id, username, public_key, "direct", address):
                 print("[SUCCESS] Contact added successfully!")
             else:
                 print("[ERROR] Contact already exists or invalid data.")
         
         elif conn_choice == "2":
-            tunnel_url = input("Tunnel URL: ").strip()
+            tunnel_url = (await self._ainput("Tunnel URL: ")).strip()
             if self.contact_manager.add_contact(user_id, username, public_key, "tunnel", tunnel_url=tunnel_url):
                 print("[SUCCESS] Contact added successfully!")
             else:
                 print("[ERROR] Contact already exists or invalid data.")
     
-    def _remove_contact_menu(self):
+    async def _remove_contact_menu(self):
         """Remove contact"""
         contacts = self.contact_manager.list_contacts()
         if not contacts:
@@ -368,13 +508,13 @@ class WhisperLinkCLI:
         
         print("\n--- Remove Contact ---")
         for i, contact in enumerate(contacts, 1):
-            print(f"{i}. {contact.username} ({contact.user_id[:8]}...)")
+            print(f"{i}. {contact.username} ({contact.short_id}...)")
         
         try:
-            choice = int(input(f"Choose contact to remove (1-{len(contacts)}): ").strip())
+            choice = int((await self._ainput(f"Choose contact to remove (1-{len(contacts)}): ")).strip())
             if 1 <= choice <= len(contacts):
                 contact = contacts[choice - 1]
-                confirm = input(f"Remove {contact.username}? (y/n): ").lower()
+                confirm = (await self._ainput(f"Remove {contact.username}? (y/n): ")).lower()
                 if confirm == 'y':
                     if self.contact_manager.remove_contact(contact.user_id):
                         print("[SUCCESS] Contact removed.")
@@ -383,7 +523,7 @@ class WhisperLinkCLI:
         except ValueError:
             print("Invalid choice.")
     
-    def _view_contact_details_menu(self):
+    async def _view_contact_details_menu(self):
         """View contact details"""
         contacts = self.contact_manager.list_contacts()
         if not contacts:
@@ -395,7 +535,7 @@ class WhisperLinkCLI:
             print(f"{i}. {contact.username}")
         
         try:
-            choice = int(input(f"Choose contact (1-{len(contacts)}): ").strip())
+            choice = int((await self._ainput(f"Choose contact (1-{len(contacts)}): ")).strip())
             if 1 <= choice <= len(contacts):
                 contact = contacts[choice - 1]
                 
@@ -414,9 +554,9 @@ class WhisperLinkCLI:
         except ValueError:
             print("Invalid choice.")
         
-        input("\nPress Enter to continue...")
+        await self._ainput("\nPress Enter to continue...")
     
-    def _view_connections_menu(self):
+    async def _view_connections_menu(self):
         """View active connections"""
         print("\n--- Active Connections ---")
         
@@ -425,37 +565,36 @@ class WhisperLinkCLI:
         if not connections:
             print("No active connections.")
         else:
-            print(f"Found {len(connections)} active connection(s):")
-            print()
-            
+            lines = [f"Found {len(connections)} active connection(s):", ""]
             for i, conn in enumerate(connections, 1):
-                print(f"{i}. {conn.peer_username} ({conn.peer_id[:8]}...)")
-                print(f"   Type: {conn.connection_type}")
-                print(f"   Address: {conn.address}:{conn.port}")
-                print(f"   Status: {conn.status}")
-                print(f"   Connected: {conn.established_at}")
-                print()
+                lines.append(f"{i}. {conn.peer_username} ({conn.short_id}...)")
+                lines.append(f"   Type: {conn.connection_type}")
+                lines.append(f"   Address: {conn.address}:{conn.port}")
+                lines.append(f"   Status: {conn.status}")
+                lines.append(f"   Connected: {conn.established_at}")
+                lines.append("")
+            sys.stdout.write("\n".join(lines) + "\n")
         
         if connections:
             print("Options:")
             print("1. Disconnect from peer")
             print("2. Back to main menu")
             
-            choice = input("Choose option (1-2): ").strip()
+            choice = (await self._ainput("Choose option (1-2): ")).strip()
             
             if choice == "1":
                 try:
-                    peer_choice = int(input(f"Choose peer to disconnect (1-{len(connections)}): ").strip())
+                    peer_choice = int((await self._ainput(f"Choose peer to disconnect (1-{len(connections)}): ")).strip())
                     if 1 <= peer_choice <= len(connections):
                         conn = connections[peer_choice - 1]
-                        self.connection_manager.disconnect_from_peer(conn.peer_id)
+                        await self.connection_manager.disconnect_from_peer(conn.peer_id)
                         print(f"[SUCCESS] Disconnected from {conn.peer_username}")
                 except ValueError:
                     print("Invalid choice.")
         
-        input("\nPress Enter to continue...")
+        await self._ainput("\nPress Enter to continue...")
     
-    def _chat_menu(self):
+    async def _chat_menu(self):
         """Chat with connected peers"""
         print("\n--- Chat with Connected Peer ---")
         
@@ -463,23 +602,23 @@ class WhisperLinkCLI:
         
         if not connections:
             print("No active connections. Connect to a peer first.")
-            input("Press Enter to continue...")
+            await self._ainput("Press Enter to continue...")
             return
         
         print("Select peer to chat with:")
         for i, conn in enumerate(connections, 1):
-            print(f"{i}. {conn.peer_username} ({conn.peer_id[:8]}...)")
+            print(f"{i}. {conn.peer_username} ({conn.short_id}...)")
         
         try:
-            choice = int(input(f"Choose peer (1-{len(connections)}): ").strip())
+            choice = int((await self._ainput(f"Choose peer (1-{len(connections)}): ")).strip())
             if 1 <= choice <= len(connections):
                 conn = connections[choice - 1]
-                self._start_chat_session(conn.peer_id, conn.peer_username)
+                await self._start_chat_session(conn.peer_id, conn.peer_username)
         except ValueError:
             print("Invalid choice.")
-            input("Press Enter to continue...")
+            await self._ainput("Press Enter to continue...")
     
-    def _start_chat_session(self, peer_id: str, peer_username: str):
+    async def _start_chat_session(self, peer_id: str, peer_username: str):
         """Start a chat session with a peer"""
         print(f"\n--- Chat with {peer_username} ---")
         print("Type 'exit' to return to main menu")
@@ -487,58 +626,48 @@ class WhisperLinkCLI:
         print("-" * 40)
         
         # Show recent chat history for this peer
-        recent_messages = [(pid, username, msg, ts) for pid, username, msg, ts in self.chat_history if pid == peer_id]
+        recent_messages = self._peer_messages(peer_id, limit=5)
         if recent_messages:
-            print("Recent messages:")
-            for _, username, message, timestamp in recent_messages[-5:]:
-                time_str = datetime.fromisoformat(timestamp).strftime("%H:%M:%S")
-                print(f"[{time_str}] {username}: {message}")
-            print("-" * 40)
+            preview = "\n".join(f"[{time.strftime('%H:%M:%S', time.localtime(ts))}] {u}: {m}" for _, u, m, ts in recent_messages)
+            sys.stdout.write(f"Recent messages:\n{preview}\n{'-' * 40}\n")
         
         while True:
-            try:
-                message = input("You: ").strip()
-                
-                if message.lower() == 'exit':
-                    break
-                elif message.lower() == 'history':
-                    self._show_chat_history(peer_id)
-                    continue
-                elif not message:
+            message = (await self._ainput("You: ")).strip()
+            
+            if message.lower() == 'exit':
+                break
+            elif message.lower() == 'history':
+                self._show_chat_history(peer_id)
+                continue
+            elif not message:
+                continue
+            
+            # Only the prompt_toolkit input keeps a multi-line paste in one entry (plain input()
+            # returns at the first newline). Send its lines one after another so they stay in order
+            for line in message.splitlines():
+                if not line.strip():
                     continue
-                
-                # Send message
-                if self.connection_manager.send_message(peer_id, message):
-                    # Add to local chat history
-                    self.chat_history.append((
-                        peer_id,
-                        "You",
-                        message,
-                        datetime.now().isoformat()
-                    ))
-                else:
+                if not await self.connection_manager.send_message(peer_id, line):
                     print("[ERROR] Failed to send message. Connection may be lost.")
-                    
-            except KeyboardInterrupt:
-                break
+                    break
+                # Add to local chat history
+                self._record_chat_message(peer_id, "You", line, time.time())
         
         print("Returning to main menu...")
     
     def _show_chat_history(self, peer_id: str):
         """Show chat history for a specific peer"""
-        messages = [(pid, username, msg, ts) for pid, username, msg, ts in self.chat_history if pid == peer_id]
+        messages = self._peer_messages(peer_id)
         
         if not messages:
             print("No chat history available.")
             return
         
-        print("\n--- Chat History ---")
-        for _, username, message, timestamp in messages:
-            time_str = datetime.fromisoformat(timestamp).strftime("%Y-%m-%d %H:%M:%S")
-            print(f"[{time_str}] {username}: {message}")
-        print("-" * 40)
+        # One write for the whole dump instead of a print() per message
+        history = "\n".join(f"[{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))}] {u}: {m}" for _, u, m, ts in messages)
+        sys.stdout.write(f"\n--- Chat History ---\n{history}\n{'-' * 40}\n")
     
-    def _export_public_info(self):
+    async def _export_public_info(self):
         """Export user's public information"""
         user = self.user_manager.get_current_user()
         if not user:
@@ -569,43 +698,63 @@ class WhisperLinkCLI:
         print()
         
         # Option to save to file
-        save_choice = input("Save to file? (y/n): ").lower()
+        save_choice = (await self._ainput("Save to file? (y/n): ")).lower()
         if save_choice == 'y':
             filename = f"whisperlink_{user.username}_public.txt"
             try:
-                with open(filename, 'w') as f:
-                    f.write(f"WhisperLink Public Information\n")
-                    f.write(f"Username: {user.username}\n")
-                    f.write(f"User ID: {user.user_id}\n")
-                    f.write(f"Public Key: {user.public_key}\n")
-                    f.write(f"Generated: {datetime.now().isoformat()}\n")
+                payload = (
+                    f"WhisperLink Public Information\n"
+                    f"Username: {user.username}\n"
+                    f"User ID: {user.user_id}\n"
+                    f"Public Key: {user.public_key}\n"
+                    f"Generated: {datetime.now().isoformat()}\n"
+                )
+                Path(filename).write_bytes(payload.encode())
                 
                 print(f"[SUCCESS] Public information saved to {filename}")
             except Exception as e:
                 print(f"[ERROR] Failed to save file: {e}")
         
-        input("\nPress Enter to continue...")
+        await self._ainput("\nPress Enter to continue...")
     
     def _get_local_ip(self) -> str:
-        """Get local IP address"""
+        """Get local IP address, re-probing at most every LOCAL_IP_TTL seconds"""
+        cached_ip, probed_at = self._local_ip_cache
+        if cached_ip and time.monotonic() - probed_at < LOCAL_IP_TTL:
+            return cached_ip
+        
         try:
             # Connect to a remote address to determine local IP
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            local_ip = s.getsockname()[0]
-            s.close()
-            return local_ip
-        except:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                s.settimeout(0.25)
+                s.connect(("8.8.8.8", 80))
+                local_ip = s.getsockname()[0]
+        except OSError:
+            local_ip = self._local_ip_from_hostname()
+        
+        self._local_ip_cache = (local_ip, time.monotonic())
+        return local_ip
+    
+    def _local_ip_from_hostname(self) -> str:
+        """Offline fallback: first non-loopback IPv4 address the hostname resolves to"""
+        try:
+            infos = socket.getaddrinfo(socket.gethostname(), None, family=socket.AF_INET)
+        except OSError:
             return "127.0.0.1"
+        for info in infos:
+            address = info[4][0]
+            if not address.startswith("127."):
+                return address
+        return "127.0.0.1"
     
-    def _logout(self):
+    async def _logout(self):
         """Logout current user"""
         print("\n--- Logout ---")
-        confirm = input("Are you sure you want to logout? (y/n): ").lower()
+        confirm = (await self._ainput("Are you sure you want to logout? (y/n): ")).lower()
         
         if confirm == 'y':
             # Cleanup connections
-            self._cleanup()
+            await self._cleanup()
             
             # Logout user
             self.user_manager.logout()
@@ -613,28 +762,27 @@ class WhisperLinkCLI:
             print("[SUCCESS] Logged out successfully.")
             
             # Start login flow again
-            if not self._login_flow():
+            if not await self._login_flow():
                 self.running = False
     
-    def _exit(self):
+    async def _exit(self):
         """Exit the application"""
         print("\n--- Exit WhisperLink ---")
-        confirm = input("Are you sure you want to exit? (y/n): ").lower()
+        confirm = (await self._ainput("Are you sure you want to exit? (y/n): ")).lower()
         
         if confirm == 'y':
             self.running = False
     
-    def _cleanup(self):
+    async def _cleanup(self):
         """Cleanup resources before exit"""
         print("Cleaning up connections...")
         
         # Stop listening
-        self.connection_manager.stop_listening()
+        await self.connection_manager.stop_listening()
         
-        # Disconnect from all peers
+        # Disconnect from all peers concurrently
         active_connections = self.connection_manager.get_active_connections()
-        for conn in active_connections:
-            self.connection_manager.disconnect_from_peer(conn.peer_id)
+        await asyncio.gather(*(self.connection_manager.disconnect_from_peer(conn.peer_id) for conn in active_connections))
         
         print("[SUCCESS] Cleanup completed.")
 
@@ -681,9 +829,22 @@ For more information, visit: https://github.com/CuzImSlymi/whisperlink
         args = Args()
     
     if args.debug:
+        # Dump Python tracebacks on fatal signals too, e.g. a crash inside a native extension
+        import faulthandler
+        faulthandler.enable()
         print("Debug mode enabled")
         print(f"Data directory: {args.data_dir}")
     
+    # Prefer uvloop's libuv-backed event loop where it is installed; the stock
+    # selector loop is used otherwise
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        if args.debug:
+            print("Using uvloop event loop")
+    except ImportError:
+        pass
+    
     try:
         # Create and start the CLI application
         app = WhisperLinkCLI()
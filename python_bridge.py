@@ -7,8 +7,17 @@ Handles communication between the Electron frontend and Python backend
 import sys
 import json
 import asyncio
+import queue
+import stat
 import threading
-from typing import Dict, Any, Optional
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial, wraps
+from operator import attrgetter
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
 import os
 
@@ -16,60 +25,241 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from user_manager import UserManager
-from contact_manager import ContactManager
-from connection_manager import ConnectionManager
-from group_manager import GroupManager
-from webrtc_manager import WebRTCManager
-from models import User, Contact, Connection
+from models import User, Group
+
+# Optional: orjson serializes responses several times faster than the stdlib json module
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+    _loads = json.loads
+
+# Optional: length-prefixed msgpack frames instead of JSON lines, for frontends that opt in
+# with WHISPERLINK_BRIDGE_FORMAT=msgpack. Electron speaks JSON lines, which stays the default
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+USE_MSGPACK = os.environ.get('WHISPERLINK_BRIDGE_FORMAT') == 'msgpack'
+
+# Field tuples serialized for the frontend; attrgetter fetches them in one C call
+_USER_KEYS = ('user_id', 'username', 'public_key', 'created_at', 'last_login')
+_USER_FIELDS = attrgetter(*_USER_KEYS)
+_CONNECTION_KEYS = ('peer_id', 'peer_username', 'connection_type', 'status',
+                    'address', 'port', 'established_at')
+_CONNECTION_FIELDS = attrgetter(*_CONNECTION_KEYS)
+_GROUP_KEYS = ('group_id', 'name', 'members', 'created_at', 'admin_id', 'description')
+_GROUP_FIELDS = attrgetter(*_GROUP_KEYS)
+
+# Log lines for stderr, written by one background thread so handlers never block on the pipe
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+
+def _log(line: str):
+    """Queue a diagnostic line for stderr, off the stdout channel Electron parses"""
+    _log_queue.put_nowait(line + "\n")
+
+def _log_worker():
+    """Drain queued log lines in batches, one write and flush per batch"""
+    while True:
+        lines = [_log_queue.get()]
+        try:
+            while True:
+                lines.append(_log_queue.get_nowait())
+        except queue.Empty:
+            pass
+        sys.stderr.write("".join(lines))
+        sys.stderr.flush()
+
+# (epoch second, its local ISO-8601 text); swapped as one tuple so threads never see a torn pair
+_iso_second = (0, '')
+
+def _iso_now() -> str:
+    """Local time in isoformat() layout, re-formatting the date part only once per second"""
+    global _iso_second
+    ns = time.time_ns()
+    sec, micros = divmod(ns // 1000, 1_000_000)
+    cached_sec, cached_text = _iso_second
+    if sec != cached_sec:
+        cached_text = datetime.fromtimestamp(sec).isoformat()
+        _iso_second = (sec, cached_text)
+    return f"{cached_text}.{micros:06d}"
+
+# Unanswered incoming calls kept for the frontend to poll; older or excess ones are dropped
+PENDING_CALLS_MAX = 256
+PENDING_CALL_TTL = 120.0  # seconds
+
+# Shared responses for common outcomes; read-only, never mutate them
+_NOT_LOGGED_IN: Dict[str, Any] = {'success': False, 'error': 'Not logged in'}
+_NO_WEBRTC: Dict[str, Any] = {'success': False, 'error': 'Not logged in or WebRTC not initialized'}
+_NO_CALL_ID: Dict[str, Any] = {'success': False, 'error': 'Call ID required'}
+_OK: Dict[str, Any] = {'success': True}
+_CREDENTIALS_REQUIRED: Dict[str, Any] = {'success': False, 'error': 'Username and password required'}
+_PEER_USERNAME_REQUIRED: Dict[str, Any] = {'success': False, 'error': 'Peer username required'}
+_GROUP_ID_REQUIRED: Dict[str, Any] = {'success': False, 'error': 'Group ID required'}
+_GROUP_NOT_FOUND: Dict[str, Any] = {'success': False, 'error': 'Group not found'}
+_MEMBER_ARGS_REQUIRED: Dict[str, Any] = {'success': False, 'error': 'Group ID and member ID required'}
+_MEMBER_IDS_REQUIRED: Dict[str, Any] = {'success': False, 'error': 'Group ID and a non-empty list of member IDs required'}
+_ADMIN_ONLY_ADD: Dict[str, Any] = {'success': False, 'error': 'Only group admin can add members'}
+
+def _requires_login(handler):
+    """Answer _NOT_LOGGED_IN unless a user is logged in
+
+    Login publishes current_user only after every user manager exists, and logout clears it
+    before dropping them, so a set current_user always comes with live managers.
+    """
+    @wraps(handler)
+    def wrapper(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        if self.current_user is None:
+            return _NOT_LOGGED_IN
+        return handler(self, args)
+    return wrapper
+
+def _requires_call_id(handler):
+    """Validate a voice-call command and pass its call_id to the coroutine handler"""
+    @wraps(handler)
+    async def wrapper(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        # The WebRTC manager exists exactly while a user is logged in
+        if self.webrtc_manager is None:
+            return _NO_WEBRTC
+        call_id = args.get('call_id')
+        if not call_id:
+            return _NO_CALL_ID
+        return await handler(self, call_id)
+    return wrapper
+
+class _SessionGate:
+    """Shared/exclusive gate around the user managers
+
+    Commands that use the managers enter shared and run concurrently; login, register and
+    logout enter exclusive, which waits for those to finish and holds new ones back until
+    the managers have been replaced.
+    """
+    __slots__ = ('_exclusive', '_users', '_idle')
+    
+    def __init__(self):
+        self._exclusive = asyncio.Lock()
+        self._users = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+    
+    @asynccontextmanager
+    async def shared(self):
+        async with self._exclusive:  # wait out a login or logout in progress
+            self._users += 1
+            self._idle.clear()
+        try:
+            yield
+        finally:
+            self._users -= 1
+            if not self._users:
+                self._idle.set()
+    
+    @asynccontextmanager
+    async def exclusive(self):
+        async with self._exclusive:
+            await self._idle.wait()
+            yield
+
+def _user_to_dict(user: User) -> Dict[str, Any]:
+    """Public fields of a user, as sent to the frontend"""
+    return dict(zip(_USER_KEYS, _USER_FIELDS(user)))
+
+def _group_to_dict(group: Group) -> Dict[str, Any]:
+    """Group fields, as sent to the frontend"""
+    return dict(zip(_GROUP_KEYS, _GROUP_FIELDS(group)))
 
 class WhisperLinkBridge:
+    # Fixed attribute layout: every handler reads these, and nothing adds attributes ad hoc
+    __slots__ = ('user_manager', 'contact_manager', 'connection_manager', 'group_manager',
+                 'webrtc_manager', 'loop', '_loop_thread_id', '_tasks', 'current_user',
+                 '_current_user_response', 'pending_messages', 'pending_calls', '_pending_lock',
+                 '_events_subscribed', '_state_lock', '_session')
+    
     def __init__(self):
-        import sys
         # Increase max listeners to prevent memory leak warnings
-        import os
         os.environ['UV_THREADPOOL_SIZE'] = '128'
         self.user_manager = UserManager()
         self.contact_manager = None  # Will be created when user logs in
         self.connection_manager = None  # Will be created when user logs in
         self.group_manager = None # Will be created when user logs in
         self.webrtc_manager = None  # Will be created when user logs in
-        self.webrtc_loop = None  # Event loop for WebRTC
+        # The command loop; it also runs peer connections and WebRTC. Set by _serve
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._tasks = set()  # strong refs to fire-and-forget tasks
         self.current_user: Optional[User] = None
-        self.pending_calls = []  # Store pending incoming calls
+        # get_current_user response, built once per login; shared and read-only
+        self._current_user_response: Optional[Dict[str, Any]] = None
+        # Filled from the command loop and worker threads, drained by the command loop
+        self.pending_messages = deque()  # Store messages for the GUI to retrieve
+        # Pending incoming calls by call_id, as (monotonic arrival time, call data)
+        self.pending_calls: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._pending_lock = threading.Lock()
+        # Once the frontend subscribes, incoming calls are pushed as events instead of queued
+        self._events_subscribed = False
+        # Held by _WRITE_COMMANDS only. The managers have no locks of their own, so contact,
+        # group and account writes run one at a time; network commands never wait on it
+        self._state_lock = asyncio.Lock()
+        # Lets login, register and logout replace the managers only while nothing uses them
+        self._session = _SessionGate()
     
     def _initialize_user_managers(self, user_id: str):
         """Initialize user-specific managers"""
+        # Imported on first login rather than at startup: aiortc and the networking stack
+        # take about half a second to load, which would delay the bridge's first response
+        from contact_manager import ContactManager
+        from connection_manager import ConnectionManager
+        from group_manager import GroupManager
+        from webrtc_manager import WebRTCManager
+        
         self.contact_manager = ContactManager(user_id=user_id)
         self.group_manager = GroupManager(user_id=user_id)
         self.connection_manager = ConnectionManager(self.user_manager, self.contact_manager)
         # Add message handler to connection manager to handle incoming messages
         self.connection_manager.add_message_handler(self._handle_incoming_message)
         
-        # Initialize WebRTC manager
+        # Initialize WebRTC manager, releasing the previous user's spare peer connection
+        self._release_webrtc_manager()
         self.webrtc_manager = WebRTCManager(user_id, self._send_webrtc_signal_callback)
         self.webrtc_manager.add_call_handler('incoming_call', self._handle_incoming_call)
         self.webrtc_manager.add_call_handler('call_accepted', self._handle_call_accepted)
         self.webrtc_manager.add_call_handler('call_rejected', self._handle_call_rejected)
         self.webrtc_manager.add_call_handler('call_ended', self._handle_call_ended)
+        # Have a peer connection ready before the first call
+        self.loop.call_soon_threadsafe(self.webrtc_manager.prewarm)
         
         # Add WebRTC signal handler to connection manager
         self.connection_manager.add_webrtc_signal_handler(self._handle_webrtc_signal)
-        
-        # Create event loop for WebRTC if needed
-        import asyncio
-        try:
-            self.webrtc_loop = asyncio.get_event_loop()
-        except RuntimeError:
-            self.webrtc_loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self.webrtc_loop)
+    
+    def _release_webrtc_manager(self):
+        """Close the WebRTC manager's spare peer connection before the manager is dropped"""
+        if self.webrtc_manager is not None:
+            self._spawn(self.webrtc_manager.close())
+    
+    def _attach_loop(self, loop: asyncio.AbstractEventLoop):
+        """Bind the bridge to the loop that runs commands, connections and WebRTC"""
+        self.loop = loop
+        self._loop_thread_id = threading.get_ident()
+    
+    def _spawn(self, coro):
+        """Schedule a coroutine on the command loop without waiting for it"""
+        if threading.get_ident() == self._loop_thread_id:
+            task = self.loop.create_task(coro)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            return task
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    
+    def _run_network(self, coro):
+        """Run a connection manager coroutine from a worker thread and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
     
     def _handle_incoming_message(self, peer_id: str, peer_username: str, message: str, timestamp: str, 
                                   is_group: bool = False, group_id: str = None, group_name: str = None):
         """Handle incoming messages from peers"""
-        # Store message for GUI to retrieve
-        if not hasattr(self, 'pending_messages'):
-            self.pending_messages = []
-        
         message_data = {
             'peer_id': peer_id,
             'peer_username': peer_username,
@@ -81,26 +271,23 @@ class WhisperLinkBridge:
             'group_name': group_name
         }
         
-        self.pending_messages.append(message_data)
+        with self._pending_lock:
+            self.pending_messages.append(message_data)
         if is_group:
-            print(f"Received group message from {peer_username} in {group_name}: {message}", flush=True)
+            _log(f"Received group message from {peer_username} in {group_name}: {message}")
         else:
-            print(f"Received message from {peer_username}: {message}", flush=True)
+            _log(f"Received message from {peer_username}: {message}")
     
-    def _send_webrtc_signal_callback(self, peer_id: str, signal_data: dict):
+    async def _send_webrtc_signal_callback(self, peer_id: str, signal_data: dict):
         """Callback for WebRTC manager to send signals via connection_manager"""
+        # WebRTC shares the connection manager's loop, so the send is awaited directly
         if self.connection_manager:
-            self.connection_manager.send_webrtc_signal(peer_id, signal_data)
+            await self.connection_manager.send_webrtc_signal(peer_id, signal_data)
     
     def _handle_webrtc_signal(self, peer_id: str, signal_data: dict):
         """Handle incoming WebRTC signal from peer"""
-        if self.webrtc_manager and self.webrtc_loop:
-            # Run the async handler in the event loop
-            import asyncio
-            asyncio.run_coroutine_threadsafe(
-                self.webrtc_manager.handle_signal(signal_data),
-                self.webrtc_loop
-            )
+        if self.webrtc_manager:
+            self._spawn(self.webrtc_manager.handle_signal(signal_data))
     
     def _handle_incoming_call(self, call_id: str, from_peer: str):
         """Handle incoming call notification"""
@@ -113,102 +300,140 @@ class WhisperLinkBridge:
             'from_peer': from_peer,
             'from_username': peer_username,
             'type': 'incoming_call',
-            'timestamp': datetime.now().isoformat()
+            'timestamp': _iso_now()
         }
-        self.pending_calls.append(call_data)
-        print(f"Incoming call from {peer_username}", flush=True)
+        _log(f"Incoming call from {peer_username}")
+        if self._events_subscribed:
+            _emit({'type': 'event', 'event': 'incoming_call', 'call': call_data})
+            return
+        now = time.monotonic()
+        with self._pending_lock:
+            pending = self.pending_calls
+            pending[call_id] = (now, call_data)
+            # Nobody polled for these: drop the oldest while over the cap or past the TTL
+            while len(pending) > PENDING_CALLS_MAX or now - next(iter(pending.values()))[0] > PENDING_CALL_TTL:
+                del pending[next(iter(pending))]
+    
+    def _discard_pending_call(self, call_id: str):
+        """Drop an incoming call from the pending queue once it is answered"""
+        with self._pending_lock:
+            self.pending_calls.pop(call_id, None)
     
     def _handle_call_accepted(self, call_id: str, peer_id: str):
         """Handle call accepted event"""
-        print(f"Call {call_id} accepted by {peer_id}", flush=True)
+        _log(f"Call {call_id} accepted by {peer_id}")
     
     def _handle_call_rejected(self, call_id: str, peer_id: str):
         """Handle call rejected event"""
-        print(f"Call {call_id} rejected by {peer_id}", flush=True)
+        _log(f"Call {call_id} rejected by {peer_id}")
     
     def _handle_call_ended(self, call_id: str, peer_id: str):
         """Handle call ended event"""
-        print(f"Call {call_id} ended with {peer_id}", flush=True)
+        _log(f"Call {call_id} ended with {peer_id}")
         
-    def handle_command(self, command: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    # Electron command name -> handler method; every handler takes the args dict
+    _COMMANDS: Dict[str, str] = {
+        'ping': '_ping',
+        'register_user': '_register_user',
+        'login_user': '_login_user',
+        'logout_user': '_logout_user',
+        'get_current_user': '_get_current_user',
+        'add_contact': '_add_contact',
+        'get_contacts': '_get_contacts',
+        'get_contacts_columns': '_get_contacts_columns',
+        'remove_contact': '_remove_contact',
+        'start_server': '_start_server',
+        'stop_server': '_stop_server',
+        'connect_to_peer': '_connect_to_peer',
+        'send_message': '_send_message',
+        'get_connections': '_get_connections',
+        'disconnect_peer': '_disconnect_peer',
+        'create_tunnel': '_create_tunnel',
+        'close_tunnel': '_close_tunnel',
+        'get_connection_info': '_get_connection_info',
+        'get_pending_messages': '_get_pending_messages',
+        'create_group': '_create_group',
+        'get_groups': '_get_groups',
+        'get_group_details': '_get_group_details',
+        'send_group_message': '_send_group_message',
+        'add_group_member': '_add_group_member',
+        'add_group_members': '_add_group_members',
+        'remove_group_member': '_remove_group_member',
+        'leave_group': '_leave_group',
+        'delete_group': '_delete_group',
+        'start_voice_call': '_start_voice_call',
+        'accept_voice_call': '_accept_voice_call',
+        'reject_voice_call': '_reject_voice_call',
+        'end_voice_call': '_end_voice_call',
+        'get_pending_calls': '_get_pending_calls',
+        'subscribe_events': '_subscribe_events',
+        'get_active_calls': '_get_active_calls',
+    }
+    
+    # Commands that only read in-memory state and run concurrently with anything; everything
+    # else does its file, crypto or network I/O on a worker thread so the command loop stays
+    # responsive, and any number of those run at once
+    _INLINE_COMMANDS = frozenset({
+        'ping', 'get_current_user', 'get_contacts', 'get_contacts_columns',
+        'get_connections', 'get_connection_info', 'get_pending_messages', 'get_groups',
+        'get_group_details', 'get_pending_calls', 'get_active_calls', 'subscribe_events',
+    })
+    
+    # Coroutine handlers, awaited on the command loop alongside the WebRTC manager
+    _ASYNC_COMMANDS = frozenset({
+        'logout_user', 'start_voice_call', 'accept_voice_call', 'reject_voice_call', 'end_voice_call',
+    })
+    
+    # Commands that replace the user managers; they wait until no other command is using them
+    _SESSION_COMMANDS = frozenset({'register_user', 'login_user', 'logout_user'})
+    
+    # Commands that write manager state which would race with itself; one at a time
+    _WRITE_COMMANDS = frozenset({
+        'add_contact', 'remove_contact', 'create_group', 'add_group_member', 'add_group_members',
+        'remove_group_member', 'leave_group', 'delete_group',
+    })
+    
+    async def handle_command(self, command: str, args: Dict[str, Any]) -> Dict[str, Any]:
         """Handle commands from Electron frontend"""
+        if isinstance(command, str):
+            # The table keys are interned literals, so the lookup matches on identity
+            command = sys.intern(command)
+        method_name = self._COMMANDS.get(command)
+        if method_name is None:
+            return {'success': False, 'error': f'Unknown command: {command}'}
+        # The one error boundary for every handler: failures become an error response here
         try:
-            if command == 'ping':
-                return {'success': True, 'message': 'pong'}
-            elif command == 'register_user':
-                return self._register_user(args)
-            elif command == 'login_user':
-                return self._login_user(args)
-            elif command == 'logout_user':
-                return self._logout_user()
-            elif command == 'get_current_user':
-                return self._get_current_user()
-            elif command == 'add_contact':
-                return self._add_contact(args)
-            elif command == 'get_contacts':
-                return self._get_contacts()
-            elif command == 'remove_contact':
-                return self._remove_contact(args)
-            elif command == 'start_server':
-                return self._start_server(args)
-            elif command == 'stop_server':
-                return self._stop_server(args)
-            elif command == 'connect_to_peer':
-                return self._connect_to_peer(args)
-            elif command == 'send_message':
-                return self._send_message(args)
-            elif command == 'get_connections':
-                return self._get_connections()
-            elif command == 'disconnect_peer':
-                return self._disconnect_peer(args)
-            elif command == 'create_tunnel':
-                return self._create_tunnel(args)
-            elif command == 'close_tunnel':
-                return self._close_tunnel(args)
-            elif command == 'get_connection_info':
-                return self._get_connection_info(args)
-            elif command == 'get_pending_messages':
-                return self._get_pending_messages(args)
-            elif command == 'create_group':
-                return self._create_group(args)
-            elif command == 'get_groups':
-                return self._get_groups(args)
-            elif command == 'get_group_details':
-                return self._get_group_details(args)
-            elif command == 'send_group_message':
-                return self._send_group_message(args)
-            elif command == 'add_group_member':
-                return self._add_group_member(args)
-            elif command == 'remove_group_member':
-                return self._remove_group_member(args)
-            elif command == 'leave_group':
-                return self._leave_group(args)
-            elif command == 'delete_group':
-                return self._delete_group(args)
-            elif command == 'start_voice_call':
-                return self._start_voice_call(args)
-            elif command == 'accept_voice_call':
-                return self._accept_voice_call(args)
-            elif command == 'reject_voice_call':
-                return self._reject_voice_call(args)
-            elif command == 'end_voice_call':
-                return self._end_voice_call(args)
-            elif command == 'get_pending_calls':
-                return self._get_pending_calls(args)
-            elif command == 'get_active_calls':
-                return self._get_active_calls()
-            else:
-                return {'success': False, 'error': f'Unknown command: {command}'}
+            handler = getattr(self, method_name)
+            if command in self._INLINE_COMMANDS:
+                return handler(args)
+            if command in self._SESSION_COMMANDS:
+                async with self._session.exclusive():
+                    return await self._run_handler(command, handler, args)
+            async with self._session.shared():
+                if command in self._WRITE_COMMANDS:
+                    async with self._state_lock:
+                        return await self._run_handler(command, handler, args)
+                return await self._run_handler(command, handler, args)
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    async def _run_handler(self, command: str, handler, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Await a coroutine handler on the loop, or run a blocking one on a worker thread"""
+        if command in self._ASYNC_COMMANDS:
+            return await handler(args)
+        return await asyncio.to_thread(handler, args)
+    
+    def _ping(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Liveness check from the frontend"""
+        return {'success': True, 'message': 'pong'}
+    
     def _register_user(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Register a new user"""
         username = args.get('username')
         password = args.get('password')
         
         if not username or not password:
-            return {'success': False, 'error': 'Username and password required'}
+            return _CREDENTIALS_REQUIRED
         
         try:
             user_id = self.user_manager.register_user(username, password)
@@ -216,19 +441,14 @@ class WhisperLinkBridge:
             # Automatically log in the new user and initialize their managers
             success = self.user_manager.login(username, password)
             if success:
-                self.current_user = self.user_manager.get_current_user()
+                # Managers first: inline commands check current_user while this runs
                 self._initialize_user_managers(user_id)
+                self._set_current_user(self.user_manager.get_current_user())
                 
                 return {
                     'success': True, 
                     'user_id': user_id,
-                    'user': {
-                        'user_id': self.current_user.user_id,
-                        'username': self.current_user.username,
-                        'public_key': self.current_user.public_key,
-                        'created_at': self.current_user.created_at,
-                        'last_login': self.current_user.last_login
-                    }
+                    'user': self._current_user_response['user']
                 }
             else:
                 return {'success': True, 'user_id': user_id}
@@ -242,358 +462,259 @@ class WhisperLinkBridge:
         password = args.get('password')
         
         if not username or not password:
-            return {'success': False, 'error': 'Username and password required'}
+            return _CREDENTIALS_REQUIRED
         
         success = self.user_manager.login(username, password)
         if success:
-            self.current_user = self.user_manager.get_current_user()
-            # Initialize user-specific managers
-            self._initialize_user_managers(self.current_user.user_id)
+            user = self.user_manager.get_current_user()
+            # Initialize user-specific managers before publishing the user; inline commands
+            # check current_user while this runs
+            self._initialize_user_managers(user.user_id)
+            self._set_current_user(user)
             
             return {
                 'success': True, 
-                'user': {
-                    'user_id': self.current_user.user_id,
-                    'username': self.current_user.username,
-                    'public_key': self.current_user.public_key,
-                    'created_at': self.current_user.created_at,
-                    'last_login': self.current_user.last_login
-                }
+                'user': self._current_user_response['user']
             }
         else:
             return {'success': False, 'error': 'Invalid credentials'}
     
-    def _logout_user(self) -> Dict[str, Any]:
+    async def _logout_user(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Logout current user"""
+        # Runs on the loop, so inline reads never see the managers half cleared
         self.user_manager.logout()
-        self.current_user = None
+        self._set_current_user(None)
         # Clear user-specific managers
+        webrtc_manager = self.webrtc_manager
         self.contact_manager = None
         self.connection_manager = None
         self.group_manager = None
-        return {'success': True}
+        self.webrtc_manager = None
+        # The next session subscribes again once its user is logged in
+        self._events_subscribed = False
+        if webrtc_manager is not None:
+            await webrtc_manager.close()
+        return _OK
     
-    def _get_current_user(self) -> Dict[str, Any]:
+    def _get_current_user(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Get current user info"""
-        if self.current_user:
-            return {
-                'success': True,
-                'user': {
-                    'user_id': self.current_user.user_id,
-                    'username': self.current_user.username,
-                    'public_key': self.current_user.public_key,
-                    'created_at': self.current_user.created_at,
-                    'last_login': self.current_user.last_login
-                }
-            }
+        response = self._current_user_response
+        if response is not None:
+            return response
         else:
             return {'success': False, 'error': 'No user logged in'}
     
+    def _set_current_user(self, user: Optional[User]):
+        """Switch the logged-in user and rebuild the cached get_current_user response"""
+        self.current_user = user
+        self._current_user_response = {'success': True, 'user': _user_to_dict(user)} if user else None
+    
+    @_requires_login
     def _add_contact(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Add a new contact"""
-        if not self.current_user or not self.contact_manager:
-            return {'success': False, 'error': 'Not logged in'}
-        
         username = args.get('username')
         public_key = args.get('public_key')
+        
+        if not username or not public_key:
+            return {'success': False, 'error': 'Username and public key required'}
+        
+        # Optional fields are only read once the required ones are present
         connection_type = args.get('connection_type', 'direct')
         address = args.get('address')
         tunnel_url = args.get('tunnel_url')
         
-        if not username or not public_key:
-            return {'success': False, 'error': 'Username and public key required'}
+        # Generate a unique contact ID
+        contact_id = uuid.uuid4().hex
         
-        try:
-            # Generate a unique contact ID
-            import uuid
-            contact_id = str(uuid.uuid4()).replace('-', '')
-            
-            success = self.contact_manager.add_contact(
-                contact_id,
-                username,
-                public_key,
-                connection_type,
-                address,
-                tunnel_url
-            )
-            
-            if success:
-                return {'success': True, 'contact_id': contact_id}
-            else:
-                return {'success': False, 'error': 'Contact already exists'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        success = self.contact_manager.add_contact(
+            contact_id,
+            username,
+            public_key,
+            connection_type,
+            address,
+            tunnel_url
+        )
+        
+        if success:
+            return {'success': True, 'contact_id': contact_id}
+        else:
+            return {'success': False, 'error': 'Contact already exists'}
     
-    def _get_contacts(self) -> Dict[str, Any]:
+    @_requires_login
+    def _get_contacts(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Get all contacts for current user"""
-        if not self.current_user or not self.contact_manager:
-            return {'success': False, 'error': 'Not logged in'}
-        
-        contacts = self.contact_manager.list_contacts()
-        contact_list = []
-        
-        for contact in contacts:
-            contact_list.append({
-                'user_id': contact.user_id,
-                'username': contact.username,
-                'public_key': contact.public_key,
-                'connection_type': contact.connection_type,
-                'address': contact.address,
-                'tunnel_url': contact.tunnel_url,
-                'added_at': contact.added_at,
-                'last_seen': contact.last_seen
-            })
-        
-        return {'success': True, 'contacts': contact_list}
+        return {'success': True, 'contacts': self.contact_manager.get_contacts_serialized()}
     
+    @_requires_login
+    def _get_contacts_columns(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Get all contacts as parallel per-field lists"""
+        return {'success': True, 'columns': self.contact_manager.get_contacts_columns()}
+    
+    @_requires_login
     def _remove_contact(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Remove a contact"""
-        if not self.current_user or not self.contact_manager:
-            return {'success': False, 'error': 'Not logged in'}
-        
         contact_username = args.get('username')
         if not contact_username:
             return {'success': False, 'error': 'Contact username required'}
         
-        try:
-            success = self.contact_manager.remove_contact_by_username(contact_username)
-            if success:
-                return {'success': True}
-            else:
-                return {'success': False, 'error': 'Contact not found'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        success = self.contact_manager.remove_contact_by_username(contact_username)
+        if success:
+            return _OK
+        else:
+            return {'success': False, 'error': 'Contact not found'}
     
+    @_requires_login
     def _start_server(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Start listening server"""
-        if not self.current_user or not self.connection_manager:
-            return {'success': False, 'error': 'Not logged in'}
-        
         port = args.get('port', 9001)
         use_tunnel = args.get('use_tunnel', False)
         
-        try:
-            success, info = self.connection_manager.start_listening(port, use_tunnel)
-            if success:
-                return {
-                    'success': True, 
-                    'message': f'Server started on port {port}',
-                    'connection_info': info,
-                    'port': port
-                }
-            else:
-                return {'success': False, 'error': info}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        success, info = self._run_network(self.connection_manager.start_listening(port, use_tunnel))
+        if success:
+            return {
+                'success': True, 
+                'message': f'Server started on port {port}',
+                'connection_info': info,
+                'port': port
+            }
+        else:
+            return {'success': False, 'error': info}
     
+    @_requires_login
     def _stop_server(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Stop listening server"""
-        if not self.current_user or not self.connection_manager:
-            return {'success': False, 'error': 'Not logged in'}
-        
-        try:
-            self.connection_manager.stop_listening()
-            return {'success': True, 'message': 'Server stopped successfully'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        self._run_network(self.connection_manager.stop_listening())
+        return {'success': True, 'message': 'Server stopped successfully'}
     
+    @_requires_login
     def _connect_to_peer(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Connect to a peer"""
-        if not self.current_user or not self.connection_manager:
-            return {'success': False, 'error': 'Not logged in'}
-        
         peer_username = args.get('peer_username')
         
         if not peer_username:
-            return {'success': False, 'error': 'Peer username required'}
+            return _PEER_USERNAME_REQUIRED
         
-        try:
-            # Find the contact by username to get their user_id
-            contacts = self.contact_manager.list_contacts()
-            peer_contact = None
-            for contact in contacts:
-                if contact.username == peer_username:
-                    peer_contact = contact
-                    break
-            
-            if not peer_contact:
-                return {'success': False, 'error': f'Contact {peer_username} not found'}
-            
-            # Use connection manager to connect
-            success = self.connection_manager.connect_to_peer(peer_contact.user_id)
-            
-            if success:
-                return {'success': True, 'message': f'Connected to {peer_username}'}
-            else:
-                return {'success': False, 'error': f'Failed to connect to {peer_username}'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        # Find the contact by username to get their user_id
+        peer_contact = self.contact_manager.get_by_username(peer_username)
+        
+        if not peer_contact:
+            return {'success': False, 'error': f'Contact {peer_username} not found'}
+        
+        # Use connection manager to connect
+        success = self._run_network(self.connection_manager.connect_to_peer(peer_contact.user_id))
+        
+        if success:
+            return {'success': True, 'message': f'Connected to {peer_username}'}
+        else:
+            return {'success': False, 'error': f'Failed to connect to {peer_username}'}
     
+    @_requires_login
     def _send_message(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Send message to peer"""
-        if not self.current_user or not self.connection_manager:
-            return {'success': False, 'error': 'Not logged in'}
-        
         peer_username = args.get('peer_username')
         message = args.get('message')
         
         if not peer_username or not message:
             return {'success': False, 'error': 'Peer username and message required'}
         
-        try:
-            # Find the contact by username to get their user_id
-            contacts = self.contact_manager.list_contacts()
-            peer_contact = None
-            for contact in contacts:
-                if contact.username == peer_username:
-                    peer_contact = contact
-                    break
-            
-            if not peer_contact:
-                return {'success': False, 'error': f'Contact {peer_username} not found'}
-            
-            # Use connection manager to send message
-            success = self.connection_manager.send_message(peer_contact.user_id, message)
-            
-            if success:
-                return {'success': True, 'message': 'Message sent'}
-            else:
-                return {'success': False, 'error': 'Failed to send message - not connected to peer'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        # Find the contact by username to get their user_id
+        peer_contact = self.contact_manager.get_by_username(peer_username)
+        
+        if not peer_contact:
+            return {'success': False, 'error': f'Contact {peer_username} not found'}
+        
+        # Use connection manager to send message
+        success = self._run_network(self.connection_manager.send_message(peer_contact.user_id, message))
+        
+        if success:
+            return {'success': True, 'message': 'Message sent'}
+        else:
+            return {'success': False, 'error': 'Failed to send message - not connected to peer'}
     
-    def _get_connections(self) -> Dict[str, Any]:
+    @_requires_login
+    def _get_connections(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Get active connections"""
-        if not self.current_user or not self.connection_manager:
-            return {'success': False, 'error': 'Not logged in'}
+        connections = self.connection_manager.get_active_connections()
+        connection_list = [dict(zip(_CONNECTION_KEYS, _CONNECTION_FIELDS(c))) for c in connections]
         
-        try:
-            connections = self.connection_manager.get_active_connections()
-            connection_list = []
-            
-            for conn in connections:
-                connection_list.append({
-                    'peer_id': conn.peer_id,
-                    'peer_username': conn.peer_username,
-                    'connection_type': conn.connection_type,
-                    'status': conn.status,
-                    'address': conn.address,
-                    'port': conn.port,
-                    'established_at': conn.established_at
-                })
-            
-            return {'success': True, 'connections': connection_list}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        return {'success': True, 'connections': connection_list}
     
+    @_requires_login
     def _disconnect_peer(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Disconnect from peer"""
-        if not self.current_user or not self.connection_manager:
-            return {'success': False, 'error': 'Not logged in'}
-        
         peer_username = args.get('peer_username')
         if not peer_username:
-            return {'success': False, 'error': 'Peer username required'}
+            return _PEER_USERNAME_REQUIRED
         
-        try:
-            # Find the contact by username to get their user_id
-            contacts = self.contact_manager.list_contacts()
-            peer_contact = None
-            for contact in contacts:
-                if contact.username == peer_username:
-                    peer_contact = contact
-                    break
-            
-            if not peer_contact:
-                return {'success': False, 'error': f'Contact {peer_username} not found'}
-            
-            # Use connection manager to disconnect
-            self.connection_manager.disconnect_from_peer(peer_contact.user_id)
-            return {'success': True, 'message': f'Disconnected from {peer_username}'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        # Find the contact by username to get their user_id
+        peer_contact = self.contact_manager.get_by_username(peer_username)
+        
+        if not peer_contact:
+            return {'success': False, 'error': f'Contact {peer_username} not found'}
+        
+        # Use connection manager to disconnect
+        self._run_network(self.connection_manager.disconnect_from_peer(peer_contact.user_id))
+        return {'success': True, 'message': f'Disconnected from {peer_username}'}
 
+    @_requires_login
     def _create_tunnel(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Create a tunnel for the current server"""
-        if not self.current_user or not self.connection_manager:
-            return {'success': False, 'error': 'Not logged in'}
+        server_port = self.connection_manager.server_port
+        if not server_port:
+            return {'success': False, 'error': 'Server must be running to create tunnel'}
         
-        port = args.get('port', self.connection_manager.server_port or 9001)
+        port = args.get('port', server_port)
         
-        try:
-            if not self.connection_manager.server_port:
-                return {'success': False, 'error': 'Server must be running to create tunnel'}
-            
-            tunnel_url = self.connection_manager.tunnel_manager.create_tunnel(port)
-            if tunnel_url:
-                return {
-                    'success': True, 
-                    'tunnel_url': tunnel_url,
-                    'message': 'Tunnel created successfully'
-                }
-            else:
-                return {'success': False, 'error': 'Failed to create tunnel'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        tunnel_url = self.connection_manager.tunnel_manager.create_tunnel(port)
+        if tunnel_url:
+            return {
+                'success': True, 
+                'tunnel_url': tunnel_url,
+                'message': 'Tunnel created successfully'
+            }
+        else:
+            return {'success': False, 'error': 'Failed to create tunnel'}
 
+    @_requires_login
     def _close_tunnel(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Close the active tunnel"""
-        if not self.current_user or not self.connection_manager:
-            return {'success': False, 'error': 'Not logged in'}
-        
         port = args.get('port', self.connection_manager.server_port or 9001)
         
-        try:
-            self.connection_manager.tunnel_manager.close_tunnel(port)
-            return {'success': True, 'message': 'Tunnel closed successfully'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        self.connection_manager.tunnel_manager.close_tunnel(port)
+        return {'success': True, 'message': 'Tunnel closed successfully'}
 
+    @_requires_login
     def _get_connection_info(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Get current connection information"""
-        if not self.current_user or not self.connection_manager:
-            return {'success': False, 'error': 'Not logged in'}
+        server_port = self.connection_manager.server_port
+        if not server_port:
+            return {'success': False, 'error': 'Server is not running'}
         
-        port = args.get('port', self.connection_manager.server_port or 9001)
+        port = args.get('port', server_port)
         
-        try:
-            if not self.connection_manager.server_port:
-                return {'success': False, 'error': 'Server is not running'}
-            
-            # Get tunnel URL if exists
-            tunnel_url = self.connection_manager.tunnel_manager.get_tunnel_url(port)
-            direct_ip = f"localhost:{port}"
-            
-            return {
-                'success': True,
-                'direct_ip': direct_ip,
-                'tunnel_url': tunnel_url,
-                'port': port
-            }
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        # Get tunnel URL if exists
+        tunnel_url = self.connection_manager.tunnel_manager.get_tunnel_url(port)
+        direct_ip = f"localhost:{port}"
+        
+        return {
+            'success': True,
+            'direct_ip': direct_ip,
+            'tunnel_url': tunnel_url,
+            'port': port
+        }
 
+    @_requires_login
     def _get_pending_messages(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Get and clear pending messages"""
-        if not self.current_user:
-            return {'success': False, 'error': 'Not logged in'}
+        # Swap in a fresh queue so nothing appended meanwhile is lost
+        with self._pending_lock:
+            messages, self.pending_messages = self.pending_messages, deque()
         
-        try:
-            if not hasattr(self, 'pending_messages'):
-                self.pending_messages = []
-            
-            messages = self.pending_messages.copy()
-            self.pending_messages.clear()  # Clear after retrieving
-            
-            return {'success': True, 'messages': messages}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        return {'success': True, 'messages': list(messages)}
 
+    @_requires_login
     def _create_group(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new group"""
-        if not self.current_user or not self.group_manager:
-            return {'success': False, 'error': 'Not logged in'}
-        
         name = args.get('name')
         members = args.get('members', [])
         description = args.get('description')
@@ -601,386 +722,467 @@ class WhisperLinkBridge:
         if not name:
             return {'success': False, 'error': 'Group name required'}
             
-        try:
-            group = self.group_manager.create_group(name, members, description)
-            return {
-                'success': True,
-                'group': {
-                    'group_id': group.group_id,
-                    'name': group.name,
-                    'members': group.members,
-                    'created_at': group.created_at,
-                    'admin_id': group.admin_id,
-                    'description': group.description
-                }
-            }
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        group = self.group_manager.create_group(name, members, description)
+        return {
+            'success': True,
+            'group': _group_to_dict(group)
+        }
 
+    @_requires_login
     def _get_groups(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Get all groups"""
-        if not self.current_user or not self.group_manager:
-            return {'success': False, 'error': 'Not logged in'}
+        groups = self.group_manager.list_groups()
+        group_list = [_group_to_dict(group) for group in groups]
             
-        try:
-            groups = self.group_manager.list_groups()
-            group_list = []
-            
-            for group in groups:
-                group_list.append({
-                    'group_id': group.group_id,
-                    'name': group.name,
-                    'members': group.members,
-                    'created_at': group.created_at,
-                    'admin_id': group.admin_id,
-                    'description': group.description
-                })
-                
-            return {'success': True, 'groups': group_list}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        return {'success': True, 'groups': group_list}
 
+    @_requires_login
     def _get_group_details(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Get group details"""
-        if not self.current_user or not self.group_manager:
-            return {'success': False, 'error': 'Not logged in'}
-            
         group_id = args.get('group_id')
         if not group_id:
-            return {'success': False, 'error': 'Group ID required'}
+            return _GROUP_ID_REQUIRED
             
-        try:
-            group = self.group_manager.get_group(group_id)
-            if group:
-                return {
-                    'success': True,
-                    'group': {
-                        'group_id': group.group_id,
-                        'name': group.name,
-                        'members': group.members,
-                        'created_at': group.created_at,
-                        'admin_id': group.admin_id,
-                        'description': group.description
-                    }
-                }
-            else:
-                return {'success': False, 'error': 'Group not found'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        group = self.group_manager.get_group(group_id)
+        if group:
+            return {
+                'success': True,
+                'group': _group_to_dict(group)
+            }
+        else:
+            return _GROUP_NOT_FOUND
 
+    @_requires_login
     def _send_group_message(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Send message to a group"""
-        if not self.current_user or not self.connection_manager or not self.group_manager:
-            return {'success': False, 'error': 'Not logged in'}
-            
         group_id = args.get('group_id')
         message = args.get('message')
         
         if not group_id or not message:
             return {'success': False, 'error': 'Group ID and message required'}
             
-        try:
-            group = self.group_manager.get_group(group_id)
-            if not group:
-                return {'success': False, 'error': 'Group not found'}
-                
-            # Send message to all group members
-            results = self.connection_manager.send_group_message(
-                group.members, 
-                message, 
-                group_id=group.group_id,
-                group_name=group.name
-            )
-            
-            # Count successful deliveries
-            successful = sum(1 for success in results.values() if success)
-            total = len([m for m in group.members if m != self.current_user.user_id])
+        group = self.group_manager.get_group(group_id)
+        if not group:
+            return _GROUP_NOT_FOUND
             
-            return {
-                'success': True,
-                'delivered': successful,
-                'total': total,
-                'results': results
-            }
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        # Send message to every other group member; the set drops self and duplicates
+        recipients = set(group.members) - {self.current_user.user_id}
+        results = self._run_network(self.connection_manager.send_group_message(
+            recipients, 
+            message, 
+            group_id=group.group_id,
+            group_name=group.name
+        ))
+        
+        # Count successful deliveries
+        successful = sum(results.values())
+        total = len(recipients)
+        
+        return {
+            'success': True,
+            'delivered': successful,
+            'total': total,
+            'results': results
+        }
 
+    @_requires_login
     def _add_group_member(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Add a member to a group"""
-        if not self.current_user or not self.group_manager:
-            return {'success': False, 'error': 'Not logged in'}
-            
         group_id = args.get('group_id')
         member_id = args.get('member_id')
         
         if not group_id or not member_id:
-            return {'success': False, 'error': 'Group ID and member ID required'}
+            return _MEMBER_ARGS_REQUIRED
             
-        try:
-            group = self.group_manager.get_group(group_id)
-            if not group:
-                return {'success': False, 'error': 'Group not found'}
-                
-            # Check if current user is admin
-            if group.admin_id != self.current_user.user_id:
-                return {'success': False, 'error': 'Only group admin can add members'}
-                
-            success = self.group_manager.add_member(group_id, member_id)
-            if success:
-                return {'success': True}
-            else:
-                return {'success': False, 'error': 'Member already in group or failed to add'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        group = self.group_manager.get_group(group_id)
+        if not group:
+            return _GROUP_NOT_FOUND
+            
+        # Check if current user is admin
+        if group.admin_id != self.current_user.user_id:
+            return _ADMIN_ONLY_ADD
+            
+        success = self.group_manager.add_member(group_id, member_id)
+        if success:
+            return _OK
+        else:
+            return {'success': False, 'error': 'Member already in group or failed to add'}
+
+    @_requires_login
+    def _add_group_members(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Add several members to a group in one command"""
+        group_id = args.get('group_id')
+        member_ids = args.get('member_ids')
+        
+        # A bare string would be iterated character by character, so insist on a list of IDs
+        if (not group_id or not isinstance(member_ids, list) or not member_ids
+                or not all(isinstance(m, str) and m for m in member_ids)):
+            return _MEMBER_IDS_REQUIRED
+            
+        group = self.group_manager.get_group(group_id)
+        if not group:
+            return _GROUP_NOT_FOUND
+            
+        # Check if current user is admin
+        if group.admin_id != self.current_user.user_id:
+            return _ADMIN_ONLY_ADD
+            
+        added = self.group_manager.add_members_batch(group_id, member_ids)
+        return {'success': True, 'added': added}
 
+    @_requires_login
     def _remove_group_member(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Remove a member from a group"""
-        if not self.current_user or not self.group_manager:
-            return {'success': False, 'error': 'Not logged in'}
-            
         group_id = args.get('group_id')
         member_id = args.get('member_id')
         
         if not group_id or not member_id:
-            return {'success': False, 'error': 'Group ID and member ID required'}
+            return _MEMBER_ARGS_REQUIRED
             
-        try:
-            group = self.group_manager.get_group(group_id)
-            if not group:
-                return {'success': False, 'error': 'Group not found'}
-                
-            # Check if current user is admin
-            if group.admin_id != self.current_user.user_id:
-                return {'success': False, 'error': 'Only group admin can remove members'}
-                
-            success = self.group_manager.remove_member(group_id, member_id)
-            if success:
-                return {'success': True}
-            else:
-                return {'success': False, 'error': 'Member not in group or failed to remove'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        group = self.group_manager.get_group(group_id)
+        if not group:
+            return _GROUP_NOT_FOUND
+            
+        # Check if current user is admin
+        if group.admin_id != self.current_user.user_id:
+            return {'success': False, 'error': 'Only group admin can remove members'}
+            
+        success = self.group_manager.remove_member(group_id, member_id)
+        if success:
+            return _OK
+        else:
+            return {'success': False, 'error': 'Member not in group or failed to remove'}
 
+    @_requires_login
     def _leave_group(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Leave a group"""
-        if not self.current_user or not self.group_manager:
-            return {'success': False, 'error': 'Not logged in'}
-            
         group_id = args.get('group_id')
         
         if not group_id:
-            return {'success': False, 'error': 'Group ID required'}
+            return _GROUP_ID_REQUIRED
             
-        try:
-            group = self.group_manager.get_group(group_id)
-            if not group:
-                return {'success': False, 'error': 'Group not found'}
-                
-            # If admin is leaving, either transfer admin or delete group
-            if group.admin_id == self.current_user.user_id:
-                # Delete the group if admin leaves
-                self.group_manager.delete_group(group_id)
-                return {'success': True, 'message': 'Group deleted (you were the admin)'}
+        group = self.group_manager.get_group(group_id)
+        if not group:
+            return _GROUP_NOT_FOUND
+            
+        # If admin is leaving, either transfer admin or delete group
+        if group.admin_id == self.current_user.user_id:
+            # Delete the group if admin leaves
+            self.group_manager.delete_group(group_id)
+            return {'success': True, 'message': 'Group deleted (you were the admin)'}
+        else:
+            success = self.group_manager.remove_member(group_id, self.current_user.user_id)
+            if success:
+                return _OK
             else:
-                success = self.group_manager.remove_member(group_id, self.current_user.user_id)
-                if success:
-                    return {'success': True}
-                else:
-                    return {'success': False, 'error': 'Failed to leave group'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+                return {'success': False, 'error': 'Failed to leave group'}
 
+    @_requires_login
     def _delete_group(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Delete a group"""
-        if not self.current_user or not self.group_manager:
-            return {'success': False, 'error': 'Not logged in'}
-            
         group_id = args.get('group_id')
         
         if not group_id:
-            return {'success': False, 'error': 'Group ID required'}
+            return _GROUP_ID_REQUIRED
             
-        try:
-            group = self.group_manager.get_group(group_id)
-            if not group:
-                return {'success': False, 'error': 'Group not found'}
-                
-            # Check if current user is admin
-            if group.admin_id != self.current_user.user_id:
-                return {'success': False, 'error': 'Only group admin can delete the group'}
-                
-            success = self.group_manager.delete_group(group_id)
-            if success:
-                return {'success': True}
-            else:
-                return {'success': False, 'error': 'Failed to delete group'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        group = self.group_manager.get_group(group_id)
+        if not group:
+            return _GROUP_NOT_FOUND
+            
+        # Check if current user is admin
+        if group.admin_id != self.current_user.user_id:
+            return {'success': False, 'error': 'Only group admin can delete the group'}
+            
+        success = self.group_manager.delete_group(group_id)
+        if success:
+            return _OK
+        else:
+            return {'success': False, 'error': 'Failed to delete group'}
 
-    def _start_voice_call(self, args: Dict[str, Any]) -> Dict[str, Any]:
+    async def _start_voice_call(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Start a voice call with a peer"""
-        if not self.current_user or not self.webrtc_manager or not self.webrtc_loop:
-            return {'success': False, 'error': 'Not logged in or WebRTC not initialized'}
+        # The WebRTC manager exists exactly while a user is logged in
+        if self.webrtc_manager is None:
+            return _NO_WEBRTC
             
         peer_id = args.get('peer_id')
         if not peer_id:
             return {'success': False, 'error': 'Peer ID required'}
             
-        try:
-            # Generate unique call ID
-            import uuid
-            call_id = str(uuid.uuid4())
-            
-            # Start call asynchronously
-            future = asyncio.run_coroutine_threadsafe(
-                self.webrtc_manager.start_call(peer_id, call_id),
-                self.webrtc_loop
-            )
-            success = future.result(timeout=10)
-            
-            if success:
-                return {'success': True, 'call_id': call_id}
-            else:
-                return {'success': False, 'error': 'Failed to start call'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        # Generate unique call ID; it is opaque, so random bytes need no UUID object
+        call_id = os.urandom(16).hex()
+        
+        # Start call on the loop the WebRTC manager lives on
+        success = await asyncio.wait_for(self.webrtc_manager.start_call(peer_id, call_id), timeout=10)
+        
+        if success:
+            return {'success': True, 'call_id': call_id}
+        else:
+            return {'success': False, 'error': 'Failed to start call'}
 
-    def _accept_voice_call(self, args: Dict[str, Any]) -> Dict[str, Any]:
+    @_requires_call_id
+    async def _accept_voice_call(self, call_id: str) -> Dict[str, Any]:
         """Accept an incoming voice call"""
-        if not self.current_user or not self.webrtc_manager or not self.webrtc_loop:
-            return {'success': False, 'error': 'Not logged in or WebRTC not initialized'}
-            
-        call_id = args.get('call_id')
-        if not call_id:
-            return {'success': False, 'error': 'Call ID required'}
-            
-        try:
-            # Accept call asynchronously
-            future = asyncio.run_coroutine_threadsafe(
-                self.webrtc_manager.accept_call(call_id),
-                self.webrtc_loop
-            )
-            success = future.result(timeout=10)
-            
-            if success:
-                # Remove from pending calls
-                self.pending_calls = [c for c in self.pending_calls if c['call_id'] != call_id]
-                return {'success': True}
-            else:
-                return {'success': False, 'error': 'Failed to accept call'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        # Accept call on the loop the WebRTC manager lives on
+        success = await asyncio.wait_for(self.webrtc_manager.accept_call(call_id), timeout=10)
+        
+        if success:
+            # Remove from pending calls
+            self._discard_pending_call(call_id)
+            return _OK
+        else:
+            return {'success': False, 'error': 'Failed to accept call'}
 
-    def _reject_voice_call(self, args: Dict[str, Any]) -> Dict[str, Any]:
+    @_requires_call_id
+    async def _reject_voice_call(self, call_id: str) -> Dict[str, Any]:
         """Reject an incoming voice call"""
-        if not self.current_user or not self.webrtc_manager or not self.webrtc_loop:
-            return {'success': False, 'error': 'Not logged in or WebRTC not initialized'}
-            
-        call_id = args.get('call_id')
-        if not call_id:
-            return {'success': False, 'error': 'Call ID required'}
-            
-        try:
-            # Reject call asynchronously
-            future = asyncio.run_coroutine_threadsafe(
-                self.webrtc_manager.reject_call(call_id),
-                self.webrtc_loop
-            )
-            success = future.result(timeout=10)
-            
-            # Remove from pending calls
-            self.pending_calls = [c for c in self.pending_calls if c['call_id'] != call_id]
-            
-            if success:
-                return {'success': True}
-            else:
-                return {'success': False, 'error': 'Failed to reject call'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        # Reject call on the loop the WebRTC manager lives on
+        success = await asyncio.wait_for(self.webrtc_manager.reject_call(call_id), timeout=10)
+        
+        # Remove from pending calls
+        self._discard_pending_call(call_id)
+        
+        if success:
+            return _OK
+        else:
+            return {'success': False, 'error': 'Failed to reject call'}
 
-    def _end_voice_call(self, args: Dict[str, Any]) -> Dict[str, Any]:
+    @_requires_call_id
+    async def _end_voice_call(self, call_id: str) -> Dict[str, Any]:
         """End an active voice call"""
-        if not self.current_user or not self.webrtc_manager or not self.webrtc_loop:
-            return {'success': False, 'error': 'Not logged in or WebRTC not initialized'}
-            
-        call_id = args.get('call_id')
-        if not call_id:
-            return {'success': False, 'error': 'Call ID required'}
-            
-        try:
-            # End call asynchronously
-            future = asyncio.run_coroutine_threadsafe(
-                self.webrtc_manager.end_call(call_id),
-                self.webrtc_loop
-            )
-            success = future.result(timeout=10)
-            
-            if success:
-                return {'success': True}
-            else:
-                return {'success': False, 'error': 'Failed to end call'}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        # End call on the loop the WebRTC manager lives on
+        success = await asyncio.wait_for(self.webrtc_manager.end_call(call_id), timeout=10)
+        
+        if success:
+            return _OK
+        else:
+            return {'success': False, 'error': 'Failed to end call'}
 
     def _get_pending_calls(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Get pending incoming calls"""
-        try:
-            calls = self.pending_calls.copy()
-            # Clear pending calls after retrieving
-            self.pending_calls = []
-            return {'success': True, 'calls': calls}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+        # Clear pending calls after retrieving
+        with self._pending_lock:
+            calls, self.pending_calls = self.pending_calls, {}
+        return {'success': True, 'calls': [call for _, call in calls.values()]}
 
-    def _get_active_calls(self) -> Dict[str, Any]:
+    def _subscribe_events(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Push incoming calls to the frontend from now on; returns the calls queued so far"""
+        self._events_subscribed = True
+        return self._get_pending_calls(args)
+
+    def _get_active_calls(self, args: Dict[str, Any]) -> Dict[str, Any]:
         """Get all active calls"""
         if not self.webrtc_manager:
             return {'success': False, 'error': 'WebRTC not initialized'}
             
+        calls = self.webrtc_manager.get_all_active_calls()
+        calls_data = [
+            {
+                'call_id': call.call_id,
+                'peer_id': call.callee_id if call.direction == 'outgoing' else call.caller_id,
+                'direction': call.direction,
+                'status': call.status,
+                'created_at': call.created_at,
+                'started_at': call.started_at
+            }
+            for call in calls
+        ]
+        return {'success': True, 'calls': calls_data}
+
+# Largest command accepted from the frontend; longer ones are discarded without parsing
+MAX_FRAME = int(os.environ.get('WHISPERLINK_MAX_FRAME', 1 << 20))
+
+# Worker threads for blocking command handlers. Connects, sends, server starts and tunnels run
+# side by side on them; only _WRITE_COMMANDS and _SESSION_COMMANDS take turns
+BRIDGE_THREADS = int(os.environ.get('WHISPERLINK_THREADS', (os.cpu_count() or 1) * 5))
+
+class _FrameTooLarge(Exception):
+    """A command exceeded MAX_FRAME and was skipped"""
+
+async def _read_line(reader: asyncio.StreamReader) -> bytes:
+    """Read one JSON command line as raw bytes; empty at EOF"""
+    try:
+        return await reader.readuntil(b'\n')
+    except asyncio.IncompleteReadError as e:
+        return e.partial  # last line without a newline, or b"" at EOF
+    except asyncio.LimitOverrunError as e:
+        # Discard the oversized line, including whatever part of it is still in flight
+        consumed = e.consumed
+        while True:
+            await reader.readexactly(consumed)
+            try:
+                await reader.readuntil(b'\n')
+                break
+            except asyncio.IncompleteReadError:
+                break
+            except asyncio.LimitOverrunError as e:
+                consumed = e.consumed
+        raise _FrameTooLarge()
+
+def _decode_line(line: bytes) -> Dict[str, Any]:
+    """Parse a JSON command line; lines that cannot hold an object are rejected unparsed"""
+    if not line.startswith(b'{'):
+        raise json.JSONDecodeError('Expecting object', '', 0)
+    return _loads(line)  # both parsers skip the trailing newline
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    """Read one 4-byte big-endian length-prefixed frame; empty at EOF"""
+    try:
+        size = int.from_bytes(await reader.readexactly(4), 'big')
+        if size > MAX_FRAME:
+            while size > 0:
+                size -= len(await reader.readexactly(min(size, 1 << 16)))
+            raise _FrameTooLarge()
+        return await reader.readexactly(size)
+    except asyncio.IncompleteReadError:
+        return b""
+
+def _feed_stdin(loop: asyncio.AbstractEventLoop, reader: asyncio.StreamReader):
+    """Copy stdin into the reader from a thread, for stdin that cannot be watched by the loop"""
+    while True:
+        chunk = sys.stdin.buffer.read1(1 << 16)
+        if not chunk:
+            loop.call_soon_threadsafe(reader.feed_eof)
+            return
+        loop.call_soon_threadsafe(reader.feed_data, chunk)
+
+async def _open_stdin(loop: asyncio.AbstractEventLoop) -> asyncio.StreamReader:
+    """Wrap stdin in a StreamReader the command loop reads without blocking"""
+    reader = asyncio.StreamReader(limit=MAX_FRAME)
+    # Only pipes and sockets can be watched by the loop. Files and devices such as /dev/null
+    # fail inside the loop rather than in connect_read_pipe, and Windows pipes need overlapped
+    # handles, so everything else is fed from a thread
+    mode = os.fstat(sys.stdin.fileno()).st_mode
+    if sys.platform != 'win32' and (stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode)):
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    else:
+        threading.Thread(target=_feed_stdin, args=(loop, reader), daemon=True,
+                         name='wl-stdin').start()
+    return reader
+
+def _encode(response: Dict[str, Any]) -> bytes:
+    """Serialize one response in the channel's framing"""
+    if USE_MSGPACK:
+        payload = msgpack.packb(response)
+        return len(payload).to_bytes(4, 'big') + payload
+    return _dumps(response) + b"\n"
+
+# Where responses are written. In msgpack mode main() points sys.stdout at stderr, so print()
+# output from the managers and tunnel code can never land inside a frame
+_response_stream = sys.stdout.buffer
+
+# Encoded responses waiting for the end of the current loop iteration. Only touched on the
+# command loop thread, so concurrent commands cannot interleave and no lock is needed
+_out = bytearray()
+
+def _flush_out():
+    """Write every queued response to the Electron process with one write and flush"""
+    if not _out:
+        return
+    sys.stdout.flush()  # keep any pending log text ahead of the responses
+    _response_stream.write(_out)
+    _out.clear()
+    _response_stream.flush()
+
+def _write(frame: bytes):
+    """Queue one encoded response; responses finished in the same loop iteration share a flush"""
+    if not _out:
+        asyncio.get_running_loop().call_soon(_flush_out)
+    _out.extend(frame)
+
+def _emit(response: Dict[str, Any]):
+    """Write one response to the Electron process"""
+    _write(_encode(response))
+
+# Heartbeat fast path: ping is answered with pre-encoded bytes, skipping the dispatcher
+# and the encoder. Must match what _ping returns
+_PONG = b'{"success":true,"message":"pong"}\n'
+_PONG_WITH_ID = b'{"success":true,"message":"pong","command_id":'
+
+async def _answer(bridge: WhisperLinkBridge, line: bytes, decode):
+    """Run one command and write its response, tagged with the caller's command_id"""
+    command_id = None
+    try:
+        data = decode(line)
+        command_id = data.get('command_id')
+        command = data.get('command')
+        if command == 'ping' and not USE_MSGPACK:
+            _write(_PONG if command_id is None else _PONG_WITH_ID + _dumps(command_id) + b"}\n")
+            return
+        args = data.get('args', {})
+        
+        response = await bridge.handle_command(command, args)
+        
+    except json.JSONDecodeError:  # orjson's decode error subclasses this too
+        response = {'success': False, 'error': 'Invalid JSON'}
+    except Exception as e:
+        response = {'success': False, 'error': f'Bridge error: {str(e)}'}
+    
+    if command_id is not None:
+        # Responses may be shared, cached dicts; tag a copy
+        response = {**response, 'command_id': command_id}
+    _emit(response)
+
+async def _serve(bridge: WhisperLinkBridge):
+    """Read commands from stdin and answer each one as soon as it completes"""
+    loop = asyncio.get_running_loop()
+    bridge._attach_loop(loop)
+    # Blocking handlers mostly wait on disk and network, so the pool is sized well past
+    # the CPU count to keep concurrent connects and tunnels from queueing behind each other
+    executor = ThreadPoolExecutor(max_workers=BRIDGE_THREADS, thread_name_prefix='wl-bridge')
+    loop.set_default_executor(executor)
+    try:
+        await _serve_commands(bridge, loop)
+    finally:
+        _flush_out()
+        if bridge.webrtc_manager is not None:
+            await bridge.webrtc_manager.close()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+async def _serve_commands(bridge: WhisperLinkBridge, loop: asyncio.AbstractEventLoop):
+    """Dispatch each stdin command as a task until EOF"""
+    reader = await _open_stdin(loop)
+    if USE_MSGPACK:
+        read, decode = _read_frame, partial(msgpack.unpackb, raw=False)
+    else:
+        read, decode = _read_line, _decode_line
+    # Every command runs as its own task, so a slow one (tunnel, connect) never holds up
+    # the next; responses are matched back to requests by command_id
+    in_flight = set()
+    while True:
         try:
-            calls = self.webrtc_manager.get_all_active_calls()
-            calls_data = [
-                {
-                    'call_id': call.call_id,
-                    'peer_id': call.callee_id if call.direction == 'outgoing' else call.caller_id,
-                    'direction': call.direction,
-                    'status': call.status,
-                    'created_at': call.created_at,
-                    'started_at': call.started_at
-                }
-                for call in calls
-            ]
-            return {'success': True, 'calls': calls_data}
-        except Exception as e:
-            return {'success': False, 'error': str(e)}
+            line = await read(reader)
+        except _FrameTooLarge:
+            _emit({'success': False, 'error': 'Command too large'})
+            continue
+        if not line:
+            break
+        
+        task = loop.create_task(_answer(bridge, line, decode))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    
+    if in_flight:
+        await asyncio.wait(in_flight)
 
 def main():
     """Main bridge process"""
+    if USE_MSGPACK and msgpack is None:
+        # The frontend asked for msgpack frames; answering in JSON lines would only hang it
+        print("WHISPERLINK_BRIDGE_FORMAT=msgpack requires the msgpack package (pip install msgpack)",
+              file=sys.stderr)
+        sys.exit(2)
+    threading.Thread(target=_log_worker, daemon=True).start()
     bridge = WhisperLinkBridge()
     
+    if USE_MSGPACK:
+        # Framed output has no room for text: every print() from here on, the banner and
+        # the managers' status lines included, goes to stderr instead
+        sys.stdout = sys.stderr
     print("WhisperLink Python bridge started", flush=True)
     
     try:
-        while True:
-            line = sys.stdin.readline()
-            if not line:
-                break
-            
-            try:
-                data = json.loads(line.strip())
-                command = data.get('command')
-                args = data.get('args', {})
-                
-                response = bridge.handle_command(command, args)
-                print(json.dumps(response), flush=True)
-                
-            except json.JSONDecodeError:
-                error_response = {'success': False, 'error': 'Invalid JSON'}
-                print(json.dumps(error_response), flush=True)
-            except Exception as e:
-                error_response = {'success': False, 'error': f'Bridge error: {str(e)}'}
-                print(json.dumps(error_response), flush=True)
-                
+        asyncio.run(_serve(bridge))
     except KeyboardInterrupt:
         pass
     except Exception as e:
@@ -2,15 +2,17 @@ import os
 import uuid
 import json
 import socket
+import struct
 import threading
 import subprocess
 import asyncio
+import inspect
 import ssl
 import urllib.parse
 import requests
 import time
 import http
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 from datetime import datetime
 from models import Connection, Contact, User
 from user_manager import UserManager
@@ -19,6 +21,16 @@ from crypto_manager import CryptoManager
 from http.server import HTTPServer, BaseHTTPRequestHandler
 import socketserver
 
+# Optional: orjson encodes straight to bytes and parses bytes without a str round-trip
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+    _loads = json.loads
+
 class TunnelManager:
     """Manages tunnel connections for privacy using ngrok only"""
     
@@ -174,6 +186,8 @@ class TunnelManager:
     
     def _start_websocket_bridge(self, tcp_port: int) -> bool:
         """Start a robust WebSocket server using aiohttp that bridges to TCP."""
+        # Set by the bridge thread once the site is bound, or when it gives up
+        started = threading.Event()
         
         def run_aiohttp_bridge():
             import asyncio
@@ -191,7 +205,9 @@ class TunnelManager:
                             async for msg in ws:
                                 if msg.type in (WSMsgType.TEXT, WSMsgType.BINARY):
                                     data = msg.data if msg.type == WSMsgType.BINARY else msg.data.encode('utf-8')
-                                    writer.write(data)
+                                    # One websocket message is one frame on the local TCP side; the
+                                    # handshake arrives framed too, so the listener uses protocol 2
+                                    writer.write(_frame(data))
                                     await writer.drain()
                                 elif msg.type == WSMsgType.ERROR:
                                     break
@@ -201,11 +217,11 @@ class TunnelManager:
                     
                     async def tcp_to_ws():
                         try:
-                            while not reader.at_eof():
-                                data = await reader.read(4096)
-                                if not data: 
-                                    break
+                            while True:
+                                data = await _read_frame(reader)
                                 await ws.send_bytes(data)
+                        except (asyncio.IncompleteReadError, ValueError):
+                            pass
                         finally:
                             if not ws.closed: 
                                 await ws.close()
@@ -261,32 +277,37 @@ class TunnelManager:
                 
                 try:
                     await site.start()
+                    self.ws_bridge_running = True
                     print(f"[SUCCESS] aiohttp WebSocket bridge running on port {self.ws_bridge_port}")
+                    started.set()
                     await asyncio.Event().wait()  # Run forever
                 finally:
                     await runner.cleanup()
             
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
-            loop.run_until_complete(start_server())
+            try:
+                loop.run_until_complete(start_server())
+            except Exception as e:
+                print(f"WebSocket bridge stopped: {e}")
+            finally:
+                started.set()
         
         bridge_thread = threading.Thread(target=run_aiohttp_bridge, daemon=True)
         bridge_thread.start()
         
+        # Return as soon as the site is listening instead of sleeping and probing the port
         print("Waiting for WebSocket bridge to start...")
-        time.sleep(4)
+        if started.wait(timeout=20) and self.ws_bridge_running:
+            return True
         
-        for i in range(8):
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.settimeout(1)
-                    if s.connect_ex(('127.0.0.1', self.ws_bridge_port)) == 0:
-                        print(f"[SUCCESS] WebSocket bridge verified running on port {self.ws_bridge_port}")
-                        self.ws_bridge_running = True
-                        return True
-            except Exception: 
-                pass
-            time.sleep(2)
+        # A bridge left running by an earlier tunnel still holds the port; reuse it
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.settimeout(1)
+            if s.connect_ex(('127.0.0.1', self.ws_bridge_port)) == 0:
+                print(f"[SUCCESS] WebSocket bridge verified running on port {self.ws_bridge_port}")
+                self.ws_bridge_running = True
+                return True
         
         print("[ERROR] WebSocket bridge failed to start")
         return False
@@ -301,6 +322,77 @@ class TunnelManager:
         return self.active_tunnels.get(local_port)
 
 
+def _tune_peer_socket(writer: asyncio.StreamWriter):
+    """Disable Nagle on a peer socket; chat frames are small and latency-bound"""
+    sock = writer.get_extra_info('socket')
+    if sock is None:
+        return
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except OSError:
+        pass
+
+# Peer wire protocol, advertised as 'protocol' in the handshake (older peers omit it):
+#   1: every message is a bare JSON write, parsed from whatever one read() returns
+#   2: after the handshake, every message is a big-endian uint32 length and that many bytes
+#      of JSON. Used only when both sides advertise it, so version 1 peers keep working
+PEER_PROTOCOL = 2
+_FRAME_HEADER = struct.Struct('>I')
+MAX_PEER_FRAME = 1024 * 1024
+
+def _frame(payload: bytes) -> bytes:
+    """Prefix a payload with its length so it goes out as a single write"""
+    return _FRAME_HEADER.pack(len(payload)) + payload
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    """Read exactly one length-prefixed frame; raises IncompleteReadError on EOF"""
+    return await _read_frame_body(reader, await reader.readexactly(_FRAME_HEADER.size))
+
+async def _read_frame_body(reader: asyncio.StreamReader, header: bytes) -> bytes:
+    (length,) = _FRAME_HEADER.unpack(header)
+    if length > MAX_PEER_FRAME:
+        raise ValueError(f"peer frame of {length} bytes exceeds {MAX_PEER_FRAME}")
+    return await reader.readexactly(length)
+
+async def _read_handshake(reader: asyncio.StreamReader) -> Tuple[dict, bool]:
+    """Read a handshake or its reply, sent bare or framed; returns (message, was_framed)"""
+    first = await reader.readexactly(1)
+    if first == b'{':
+        # Bare JSON, as protocol 1 peers send it: one write, read back with one read()
+        return _loads(first + await reader.read(1023)), False
+    # A frame header; its first byte is zero for any frame under MAX_PEER_FRAME
+    header = first + await reader.readexactly(_FRAME_HEADER.size - 1)
+    return _loads(await _read_frame_body(reader, header)), True
+
+def _decode_json_messages(data: bytes) -> List[dict]:
+    """Decode one read's worth of protocol 1 messages; pipelined sends can arrive back to back"""
+    try:
+        # json accepts the UTF-8 bytes directly, no intermediate str copy
+        return [json.loads(data)]
+    except json.JSONDecodeError:
+        pass
+    
+    messages = []
+    decoder = json.JSONDecoder()
+    text = data.decode(errors='replace')
+    pos = 0
+    try:
+        while pos < len(text):
+            message_data, pos = decoder.raw_decode(text, pos)
+            messages.append(message_data)
+            while pos < len(text) and text[pos].isspace():
+                pos += 1
+    except json.JSONDecodeError:
+        pass
+    return messages
+
+async def _call_handler(handler: callable, *args, **kwargs):
+    """Invoke a registered handler, awaiting it when it is a coroutine function"""
+    result = handler(*args, **kwargs)
+    if inspect.isawaitable(result):
+        await result
+
+
 class ConnectionManager:
     """Manages P2P connections with other peers"""
     
@@ -308,84 +400,89 @@ class ConnectionManager:
         self.user_manager = user_manager
         self.contact_manager = contact_manager
         self.tunnel_manager = TunnelManager()
+        # CryptoManager is stateless, one instance serves every send and receive
+        self.crypto = CryptoManager()
         self.connections: Dict[str, Connection] = {}
-        self.server_socket: Optional[socket.socket] = None
+        self.server: Optional[asyncio.AbstractServer] = None
         self.server_port: Optional[int] = None
         self.listening = False
         self.message_handlers: List[callable] = []
         self.webrtc_signal_handlers: List[callable] = []
+        # Strong references to background tasks so they aren't garbage collected mid-flight
+        self._tasks: Set[asyncio.Task] = set()
     
     def add_message_handler(self, handler: callable):
+        """Register a message handler; coroutine functions are awaited on the event loop"""
         self.message_handlers.append(handler)
     
     def add_webrtc_signal_handler(self, handler: callable):
         self.webrtc_signal_handlers.append(handler)
     
-    def start_listening(self, port: int = 0, use_tunnel: bool = False) -> Tuple[bool, str]:
+    def _peer_box(self, current_user: Optional[User], contact: Optional[Contact]):
+        """Run the key exchange with a peer once, so messages only pay for the symmetric cipher"""
+        if not current_user or not contact:
+            return None
+        return self.crypto.precompute_box(current_user.private_key, contact.public_key)
+    
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+    
+    async def start_listening(self, port: int = 0, use_tunnel: bool = False) -> Tuple[bool, str]:
         try:
-            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.server_socket.bind(('0.0.0.0', port))
-            self.server_socket.listen(5)
-            self.server_port = self.server_socket.getsockname()[1]
+            self.server = await asyncio.start_server(
+                self._handle_incoming_connection, '0.0.0.0', port, reuse_address=True
+            )
+            self.server_port = self.server.sockets[0].getsockname()[1]
             self.listening = True
             
-            listen_thread = threading.Thread(target=self._listen_for_connections, daemon=True)
-            listen_thread.start()
-            
             connection_info = f"localhost:{self.server_port}"
             
             if use_tunnel:
                 print("Creating secure tunnel (this may take a moment)...")
-                tunnel_url = self.tunnel_manager.create_tunnel(self.server_port)
+                # Tunnel setup shells out to ngrok and polls its API, keep it off the event loop
+                loop = asyncio.get_running_loop()
+                tunnel_url = await loop.run_in_executor(None, self.tunnel_manager.create_tunnel, self.server_port)
                 if tunnel_url:
                     connection_info = tunnel_url
                 else:
-                    self.stop_listening()
+                    await self.stop_listening()
                     return False, "[ERROR] Failed to create tunnel. Try direct IP connection instead."
             
             return True, connection_info
         except Exception as e:
             return False, f"[ERROR] Failed to start listening: {str(e)}"
     
-    def stop_listening(self):
+    async def stop_listening(self):
         self.listening = False
-        if self.server_socket:
+        if self.server:
             try:
-                self.server_socket.close()
+                self.server.close()
             except:
                 pass
-            self.server_socket = None
+            self.server = None
         
         if self.server_port:
-            self.tunnel_manager.close_tunnel(self.server_port)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.tunnel_manager.close_tunnel, self.server_port)
     
-    def _listen_for_connections(self):
-        while self.listening and self.server_socket:
-            try:
-                client_socket, client_address = self.server_socket.accept()
-                handle_thread = threading.Thread(
-                    target=self._handle_incoming_connection,
-                    args=(client_socket, client_address),
-                    daemon=True
-                )
-                handle_thread.start()
-            except Exception as e:
-                if self.listening:
-                    print(f"Error accepting connection: {e}")
-                break
-    
-    def _handle_incoming_connection(self, client_socket: socket.socket, client_address: tuple):
+    async def _handle_incoming_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client_address = writer.get_extra_info('peername')
+        _tune_peer_socket(writer)
         try:
-            handshake_data = client_socket.recv(1024).decode()
-            handshake = json.loads(handshake_data)
+            handshake, framed = await _read_handshake(reader)
+            # A framed handshake comes from our own websocket bridge; direct peers send it bare
+            # for the sake of protocol 1 listeners and advertise framing in the message instead
+            framed = framed or handshake.get('protocol', 1) >= 2
             
             peer_id = handshake.get('user_id')
             peer_username = handshake.get('username')
             peer_public_key = handshake.get('public_key')
             
             if not all([peer_id, peer_username, peer_public_key]):
-                client_socket.close()
+                writer.close()
                 return
 
             # If the connecting user is not a contact, add them. This is crucial for message exchange.
@@ -401,16 +498,19 @@ class ConnectionManager:
             
             current_user = self.user_manager.get_current_user()
             if not current_user:
-                client_socket.close()
+                writer.close()
                 return
             
             response = {
                 'user_id': current_user.user_id,
                 'username': current_user.username,
                 'public_key': current_user.public_key,
-                'status': 'accepted'
+                'status': 'accepted',
+                'protocol': PEER_PROTOCOL
             }
-            client_socket.send(json.dumps(response).encode())
+            payload = _dumps(response)
+            writer.write(_frame(payload) if framed else payload)
+            await writer.drain()
             
             connection = Connection(
                 peer_id=peer_id,
@@ -420,30 +520,29 @@ class ConnectionManager:
                 port=client_address[1],
                 status="connected",
                 established_at=datetime.now().isoformat(),
-                socket_obj=client_socket
+                reader=reader,
+                writer=writer,
+                box=self._peer_box(current_user, self.contact_manager.get_contact(peer_id)),
+                framed=framed
             )
             
             self.connections[peer_id] = connection
             self.contact_manager.update_contact_last_seen(peer_id)
             
             print(f"\n[SUCCESS] Incoming connection established with {peer_username}")
-            
-            # Start a dedicated thread for handling messages, mirroring the outgoing connection logic
-            message_thread = threading.Thread(
-                target=self._handle_peer_messages,
-                args=(peer_id,),
-                daemon=True
-            )
-            message_thread.start()
         
         except Exception as e:
             print(f"Error handling incoming connection: {e}")
             try:
-                client_socket.close()
+                writer.close()
             except:
                 pass
+            return
+        
+        # Keep servicing this peer from the server's connection task, mirroring the outgoing connection logic
+        await self._handle_peer_messages(peer_id)
     
-    def connect_to_peer(self, peer_id: str) -> bool:
+    async def connect_to_peer(self, peer_id: str) -> bool:
         contact = self.contact_manager.get_contact(peer_id)
         if not contact:
             return False
@@ -454,35 +553,36 @@ class ConnectionManager:
         
         try:
             if contact.connection_type == "direct" and contact.address:
-                return self._connect_direct(peer_id, contact, current_user)
+                return await self._connect_direct(peer_id, contact, current_user)
             elif contact.connection_type == "tunnel" and contact.tunnel_url:
-                return self._connect_via_tunnel(peer_id, contact, current_user)
+                return await self._connect_via_tunnel(peer_id, contact, current_user)
             else:
                 return False
         except Exception as e:
             print(f"[ERROR] Failed to connect to peer: {e}")
             return False
     
-    def _connect_direct(self, peer_id: str, contact: Contact, current_user: User) -> bool:
+    async def _connect_direct(self, peer_id: str, contact: Contact, current_user: User) -> bool:
+        writer = None
         try:
-            client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            client_socket.settimeout(10)
-            
             host, port = contact.address.split(':')
-            client_socket.connect((host, int(port)))
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, int(port)), timeout=10)
+            _tune_peer_socket(writer)
             
             handshake = {
                 'user_id': current_user.user_id,
                 'username': current_user.username,
-                'public_key': current_user.public_key
+                'public_key': current_user.public_key,
+                'protocol': PEER_PROTOCOL
             }
-            client_socket.send(json.dumps(handshake).encode())
+            # Sent bare so protocol 1 listeners can read it; a protocol 2 listener replies framed
+            writer.write(_dumps(handshake))
+            await writer.drain()
             
-            response_data = client_socket.recv(1024).decode()
-            response = json.loads(response_data)
+            response, framed = await asyncio.wait_for(_read_handshake(reader), timeout=10)
             
             if response.get('status') != 'accepted':
-                client_socket.close()
+                writer.close()
                 return False
             
             connection = Connection(
@@ -493,16 +593,14 @@ class ConnectionManager:
                 port=0,
                 status="connected",
                 established_at=datetime.now().isoformat(),
-                socket_obj=client_socket
+                reader=reader,
+                writer=writer,
+                box=self._peer_box(current_user, contact),
+                framed=framed
             )
             
             self.connections[peer_id] = connection
-            
-            message_thread = threading.Thread(
-                target=self._handle_peer_messages,
-                args=(peer_id,), daemon=True
-            )
-            message_thread.start()
+            self._spawn(self._handle_peer_messages(peer_id))
             
             print(f"[SUCCESS] Successfully connected to {contact.username}")
             return True
@@ -510,12 +608,13 @@ class ConnectionManager:
         except Exception as e:
             print(f"[ERROR] Direct connection failed: {e}")
             try:
-                client_socket.close()
+                if writer:
+                    writer.close()
             except:
                 pass
             return False
     
-    def _connect_via_tunnel(self, peer_id: str, contact: Contact, current_user: User) -> bool:
+    async def _connect_via_tunnel(self, peer_id: str, contact: Contact, current_user: User) -> bool:
         print(f"Connecting to {contact.username} via tunnel...")
         
         try:
@@ -536,48 +635,27 @@ class ConnectionManager:
                 established_at=datetime.now().isoformat(),
             )
             
-            def run_async_connect():
-                # Each connection gets its own event loop
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    loop.run_until_complete(self._async_tunnel_connect(peer_id, contact, handshake, loop))
-                    # If the connection was successful, the loop will have tasks (message handler)
-                    # and we run it forever to keep it alive.
-                    if not loop.is_closed() and self.connections.get(peer_id):
-                        loop.run_forever()
-                except Exception as e:
-                    print(f"[ERROR] Tunnel connection thread error: {e}")
-                    self.disconnect_from_peer(peer_id)
-                finally:
-                    # Final cleanup of the loop
-                    if not loop.is_closed():
-                        if loop.is_running():
-                            loop.stop()
-                        loop.close()
-            
-            connect_thread = threading.Thread(target=run_async_connect, daemon=True)
-            connect_thread.start()
+            # The WebSocket handshake runs as a task on the shared loop
+            self._spawn(self._async_tunnel_connect(peer_id, contact, handshake))
             
             # Immediately return True to indicate the connection process has started
             return True
             
         except Exception as e:
             print(f"[ERROR] Tunnel connection failed: {e}")
-            self.disconnect_from_peer(peer_id) # Clean up placeholder
+            await self.disconnect_from_peer(peer_id) # Clean up placeholder
             return False
 
-    async def _async_tunnel_connect(self, peer_id: str, contact: Contact, handshake: dict, loop: asyncio.AbstractEventLoop):
+    async def _async_tunnel_connect(self, peer_id: str, contact: Contact, handshake: dict):
         try:
             tunnel_url = contact.tunnel_url.rstrip('/')
             print(f"Connecting to: {tunnel_url}")
-            await self._try_websocket_connection(peer_id, contact, handshake, tunnel_url, loop)
+            await self._try_websocket_connection(peer_id, contact, handshake, tunnel_url)
         except Exception as e:
             print(f"[ERROR] Tunnel connection error: {e}")
-            self.disconnect_from_peer(peer_id) # Clean up on failure
-            raise # Re-raise to be caught by the thread's error handler
+            await self.disconnect_from_peer(peer_id) # Clean up on failure
 
-    async def _try_websocket_connection(self, peer_id: str, contact: Contact, handshake: dict, tunnel_url: str, loop: asyncio.AbstractEventLoop):
+    async def _try_websocket_connection(self, peer_id: str, contact: Contact, handshake: dict, tunnel_url: str):
         import websockets  # Use websockets for the client side
         
         ws_base_url = tunnel_url.replace('https://', 'wss://').replace('http://', 'ws://')
@@ -599,9 +677,9 @@ class ConnectionManager:
                     open_timeout=20, ping_interval=30, ping_timeout=10
                 ), timeout=25.0)
                 
-                await websocket.send(json.dumps(handshake))
+                await websocket.send(_dumps(handshake))
                 response_data = await asyncio.wait_for(websocket.recv(), timeout=15.0)
-                response = json.loads(response_data)
+                response = _loads(response_data)
                 
                 if response.get('status') == 'accepted':
                     connection = self.connections.get(peer_id)
@@ -609,16 +687,18 @@ class ConnectionManager:
                         connection.status = "connected"
                         connection.established_at = datetime.now().isoformat()
                         connection.websocket_obj = websocket
-                        connection.asyncio_loop = loop # Store the loop with the connection
+                        connection.box = self._peer_box(self.user_manager.get_current_user(), contact)
                         self.contact_manager.update_contact_last_seen(peer_id)
                         print(f"[SUCCESS] Successfully connected to {contact.username} via tunnel")
-                        # Start the message handler as a task on this connection's loop
-                        loop.create_task(self._handle_websocket_messages_native(peer_id, websocket))
-                        return # Exit the function on success
+                        # Service the WebSocket from this task for the lifetime of the connection
+                        await self._handle_websocket_messages_native(peer_id, websocket)
+                    else:
+                        await websocket.close()
+                    return
                 else:
                     await websocket.close()
                     print("[ERROR] Handshake rejected by peer")
-                    self.disconnect_from_peer(peer_id)
+                    await self.disconnect_from_peer(peer_id)
                     return # Handshake failed, stop trying
                     
             except asyncio.TimeoutError:
@@ -632,94 +712,107 @@ class ConnectionManager:
                 continue
         
         print("[ERROR] All WebSocket connection attempts failed")
-        self.disconnect_from_peer(peer_id)
+        await self.disconnect_from_peer(peer_id)
+    
+    async def _dispatch_peer_message(self, peer_id: str, peer_username: str, message_data: dict, box=None):
+        """Decrypt a decoded peer frame and fan it out to the registered handlers
+        
+        The read loops pass the connection's handshake Box so chat frames skip the user lookup;
+        frames from removed contacts are still ignored.
+        """
+        msg_type = message_data.get('type')
+        
+        if msg_type in ('chat', 'group_chat'):
+            contact = self.contact_manager.get_contact(peer_id)
+            if not contact:
+                return
+            
+            if box is not None:
+                decrypted = self.crypto.decrypt_with_box(box, message_data.get('message'))
+            else:
+                current_user = self.user_manager.get_current_user()
+                if not current_user:
+                    return
+                decrypted = self.crypto.decrypt_message(current_user.private_key, contact.public_key, message_data.get('message'))
+            
+            # For group messages, include group metadata
+            if msg_type == 'group_chat':
+                for handler in self.message_handlers:
+                    await _call_handler(
+                        handler,
+                        peer_id, 
+                        peer_username, 
+                        decrypted, 
+                        message_data.get('timestamp'),
+                        is_group=True,
+                        group_id=message_data.get('group_id'),
+                        group_name=message_data.get('group_name')
+                    )
+            else:
+                for handler in self.message_handlers:
+                    await _call_handler(handler, peer_id, peer_username, decrypted, message_data.get('timestamp'))
+        elif msg_type == 'webrtc_signal':
+            # Handle WebRTC signaling
+            for handler in self.webrtc_signal_handlers:
+                await _call_handler(handler, peer_id, message_data.get('signal'))
     
-    def _handle_peer_messages(self, peer_id: str):
+    async def _handle_peer_messages(self, peer_id: str):
         connection = self.connections.get(peer_id)
-        if not connection or not connection.socket_obj: return
+        if not connection or not connection.reader: return
         
+        # Everything the loop needs per frame is fixed for the life of the connection
+        reader = connection.reader
+        peer_username = connection.peer_username
+        box = connection.box
+        framed = connection.framed
+        dispatch = self._dispatch_peer_message
         try:
             while connection.status == "connected":
-                data = connection.socket_obj.recv(4096)
-                if not data: break
+                if framed:
+                    data = await _read_frame(reader)
+                    try:
+                        messages = (_loads(data),)
+                    except json.JSONDecodeError: continue  # orjson's decode error subclasses this too
+                else:
+                    data = await reader.read(4096)
+                    if not data: break
+                    messages = _decode_json_messages(data)
                 
-                try:
-                    message_data = json.loads(data.decode())
-                    msg_type = message_data.get('type')
-                    
-                    if msg_type in ('chat', 'group_chat'):
-                        current_user = self.user_manager.get_current_user()
-                        contact = self.contact_manager.get_contact(peer_id)
-                        
-                        if current_user and contact:
-                            crypto = CryptoManager()
-                            decrypted = crypto.decrypt_message(current_user.private_key, contact.public_key, message_data.get('message'))
-                            
-                            # For group messages, include group metadata
-                            if msg_type == 'group_chat':
-                                # Pass group info along with the message
-                                for handler in self.message_handlers:
-                                    handler(
-                                        peer_id, 
-                                        connection.peer_username, 
-                                        decrypted, 
-                                        message_data.get('timestamp'),
-                                        is_group=True,
-                                        group_id=message_data.get('group_id'),
-                                        group_name=message_data.get('group_name')
-                                    )
-                            else:
-                                for handler in self.message_handlers:
-                                    handler(peer_id, connection.peer_username, decrypted, message_data.get('timestamp'))
-                    elif msg_type == 'webrtc_signal':
-                        # Handle WebRTC signaling
-                        for handler in self.webrtc_signal_handlers:
-                            handler(peer_id, message_data.get('signal'))
-                except json.JSONDecodeError: continue
+                for message_data in messages:
+                    await dispatch(peer_id, peer_username, message_data, box)
         except Exception: pass
         finally:
-            self.disconnect_from_peer(peer_id)
+            await self.disconnect_from_peer(peer_id)
     
     async def _handle_websocket_messages_native(self, peer_id: str, websocket):
+        contact = self.contact_manager.get_contact(peer_id)
+        peer_username = contact.username if contact else peer_id
+        connection = self.connections.get(peer_id)
+        box = connection.box if connection else None
+        dispatch = self._dispatch_peer_message
         try:
             async for message in websocket:
                 try:
-                    message_data = json.loads(message)
-                    msg_type = message_data.get('type')
-                    
-                    if msg_type in ('chat', 'group_chat'):
-                        current_user = self.user_manager.get_current_user()
-                        contact = self.contact_manager.get_contact(peer_id)
-                        
-                        if current_user and contact:
-                            crypto = CryptoManager()
-                            decrypted = crypto.decrypt_message(current_user.private_key, contact.public_key, message_data.get('message'))
-                            
-                            # For group messages, include group metadata
-                            if msg_type == 'group_chat':
-                                for handler in self.message_handlers:
-                                    handler(
-                                        peer_id, 
-                                        contact.username, 
-                                        decrypted, 
-                                        message_data.get('timestamp'),
-                                        is_group=True,
-                                        group_id=message_data.get('group_id'),
-                                        group_name=message_data.get('group_name')
-                                    )
-                            else:
-                                for handler in self.message_handlers:
-                                    handler(peer_id, contact.username, decrypted, message_data.get('timestamp'))
-                    elif msg_type == 'webrtc_signal':
-                        # Handle WebRTC signaling
-                        for handler in self.webrtc_signal_handlers:
-                            handler(peer_id, message_data.get('signal'))
+                    message_data = _loads(message)
                 except json.JSONDecodeError: continue
+                await dispatch(peer_id, peer_username, message_data, box)
         except Exception: pass
         finally:
-            self.disconnect_from_peer(peer_id)
+            await self.disconnect_from_peer(peer_id)
     
-    def send_message(self, peer_id: str, message: str) -> bool:
+    async def _send_frame(self, connection: Connection, message_data: dict) -> bool:
+        """Write one JSON message to whichever transport the connection uses; framed TCP peers get a length prefix"""
+        if connection.websocket_obj:
+            await connection.websocket_obj.send(_dumps(message_data))
+            return True
+        elif connection.writer:
+            payload = _dumps(message_data)
+            connection.writer.write(_frame(payload) if connection.framed else payload)
+            await connection.writer.drain()
+            return True
+        return False
+    
+    async def send_message(self, peer_id: str, message: str) -> bool:
         connection = self.connections.get(peer_id)
         if not connection or connection.status != "connected": 
             return False
@@ -730,49 +823,27 @@ class ConnectionManager:
             return False
         
         try:
-            crypto = CryptoManager()
-            encrypted_message = crypto.encrypt_message(current_user.private_key, contact.public_key, message)
+            if connection.box is not None:
+                encrypted_message = self.crypto.encrypt_with_box(connection.box, current_user.private_key, message)
+            else:
+                encrypted_message = self.crypto.encrypt_message(current_user.private_key, contact.public_key, message)
             message_data = {'type': 'chat', 'message': encrypted_message, 'timestamp': datetime.now().isoformat()}
-            
-            # For outgoing WebSocket connections, use the loop stored on the connection object
-            if connection.websocket_obj and connection.asyncio_loop and connection.asyncio_loop.is_running():
-                asyncio.run_coroutine_threadsafe(
-                    self._send_websocket_message(connection.websocket_obj, message_data),
-                    connection.asyncio_loop
-                )
-                return True
-            # For incoming connections (which use the bridge), use the socket object
-            elif connection.socket_obj:
-                connection.socket_obj.sendall(json.dumps(message_data).encode())
-                return True
-            
-            return False
+            return await self._send_frame(connection, message_data)
         except Exception as e:
             print(f"[ERROR] Failed to send message: {e}")
             return False
     
-    async def _send_websocket_message(self, websocket, message_data):
-        try:
-            await websocket.send(json.dumps(message_data))
-        except Exception as e:
-            print(f"[ERROR] Failed to send WebSocket message: {e}")
-    
-    def disconnect_from_peer(self, peer_id: str):
+    async def disconnect_from_peer(self, peer_id: str):
         if peer_id in self.connections:
             connection = self.connections.pop(peer_id)
             connection.status = "disconnected"
             
-            if connection.socket_obj:
-                try: connection.socket_obj.close()
+            if connection.writer:
+                try: connection.writer.close()
                 except: pass
             
-            # When disconnecting a WebSocket, also stop its dedicated event loop
-            if connection.websocket_obj and connection.asyncio_loop and connection.asyncio_loop.is_running():
-                try:
-                    # Close the socket from within its own loop
-                    asyncio.run_coroutine_threadsafe(connection.websocket_obj.close(), connection.asyncio_loop)
-                    # Stop the loop
-                    connection.asyncio_loop.call_soon_threadsafe(connection.asyncio_loop.stop)
+            if connection.websocket_obj:
+                try: await connection.websocket_obj.close()
                 except: pass
             
             print(f"\nDisconnected from {connection.peer_username}")
@@ -783,11 +854,15 @@ class ConnectionManager:
     def get_connection(self, peer_id: str) -> Optional[Connection]:
         return self.connections.get(peer_id)
     
-    def send_group_message(self, group_members: List[str], message: str, group_id: str = None, group_name: str = None) -> Dict[str, bool]:
+    def connections_snapshot(self) -> FrozenSet[str]:
+        """Peer IDs connected right now, for rendering a consistent status list"""
+        return frozenset(self.connections)
+    
+    async def send_group_message(self, group_members: Iterable[str], message: str, group_id: str = None, group_name: str = None) -> Dict[str, bool]:
         """Send a message to multiple peers (group messaging)
         
         Args:
-            group_members: List of user_ids in the group
+            group_members: User IDs in the group (any iterable)
             message: Message to send
             group_id: Optional group identifier
             group_name: Optional group name
@@ -799,64 +874,45 @@ class ConnectionManager:
         if not current_user:
             return {}
         
-        results = {}
+        timestamp = datetime.now().isoformat()
         
-        for member_id in group_members:
-            # Don't send to self
-            if member_id == current_user.user_id:
-                continue
-                
+        async def send_to_member(member_id: str) -> bool:
             connection = self.connections.get(member_id)
             contact = self.contact_manager.get_contact(member_id)
             
             # Skip if not connected or not in contacts
             if not connection or connection.status != "connected" or not contact:
-                results[member_id] = False
-                continue
+                return False
             
             try:
-                crypto = CryptoManager()
-                encrypted_message = crypto.encrypt_message(current_user.private_key, contact.public_key, message)
+                if connection.box is not None:
+                    encrypted_message = self.crypto.encrypt_with_box(connection.box, current_user.private_key, message)
+                else:
+                    encrypted_message = self.crypto.encrypt_message(current_user.private_key, contact.public_key, message)
                 
                 message_data = {
                     'type': 'group_chat',
                     'message': encrypted_message,
-                    'timestamp': datetime.now().isoformat(),
+                    'timestamp': timestamp,
                     'group_id': group_id,
                     'group_name': group_name,
                     'sender_id': current_user.user_id,
                     'sender_username': current_user.username
                 }
                 
-                # Send via websocket or regular socket
-                if connection.websocket_obj and hasattr(self, 'websocket_loop') and self.websocket_loop.is_running():
-                    try:
-                        future = asyncio.run_coroutine_threadsafe(
-                            self._send_websocket_message(connection.websocket_obj, message_data),
-                            self.websocket_loop
-                        )
-                        future.result(timeout=10)
-                        results[member_id] = True
-                    except Exception as e:
-                        print(f"[ERROR] Failed to send group message to {contact.username} via websocket: {e}")
-                        results[member_id] = False
-                elif connection.socket_obj:
-                    try:
-                        connection.socket_obj.sendall(json.dumps(message_data).encode())
-                        results[member_id] = True
-                    except Exception as e:
-                        print(f"[ERROR] Failed to send group message to {contact.username}: {e}")
-                        results[member_id] = False
-                else:
-                    results[member_id] = False
+                return await self._send_frame(connection, message_data)
                     
             except Exception as e:
-                print(f"[ERROR] Failed to encrypt/send group message to {member_id}: {e}")
-                results[member_id] = False
+                print(f"[ERROR] Failed to send group message to {contact.username}: {e}")
+                return False
         
-        return results
+        # Don't send to self; dict.fromkeys also drops duplicate members
+        recipients = list(dict.fromkeys(m for m in group_members if m != current_user.user_id))
+        # Deliver to every member at once, so a slow peer only delays its own send
+        sent = await asyncio.gather(*(send_to_member(m) for m in recipients))
+        return dict(zip(recipients, sent))
     
-    def send_webrtc_signal(self, peer_id: str, signal_data: dict) -> bool:
+    async def send_webrtc_signal(self, peer_id: str, signal_data: dict) -> bool:
         """Send WebRTC signaling message to a peer
         
         Args:
@@ -877,29 +933,8 @@ class ConnectionManager:
                 'signal': signal_data,
                 'timestamp': datetime.now().isoformat()
             }
-            
-            # Send via websocket or regular socket
-            if connection.websocket_obj and hasattr(self, 'websocket_loop') and self.websocket_loop.is_running():
-                try:
-                    future = asyncio.run_coroutine_threadsafe(
-                        self._send_websocket_message(connection.websocket_obj, message_data),
-                        self.websocket_loop
-                    )
-                    future.result(timeout=10)
-                    return True
-                except Exception as e:
-                    print(f"[ERROR] Failed to send WebRTC signal via websocket: {e}")
-                    return False
-            elif connection.socket_obj:
-                try:
-                    connection.socket_obj.sendall(json.dumps(message_data).encode())
-                    return True
-                except Exception as e:
-                    print(f"[ERROR] Failed to send WebRTC signal: {e}")
-                    return False
-            
-            return False
+            return await self._send_frame(connection, message_data)
             
         except Exception as e:
             print(f"[ERROR] Failed to send WebRTC signal: {e}")
-            return False
\ No newline at end of file
+            return False
@@ -1,11 +1,17 @@
 import os
 import json
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 from dataclasses import asdict
+from operator import attrgetter
 
 from models import Contact
 
+# Contact fields sent to frontends; attrgetter fetches them in one C call
+_CONTACT_KEYS = ('user_id', 'username', 'public_key', 'connection_type',
+                 'address', 'tunnel_url', 'added_at', 'last_seen')
+_CONTACT_FIELDS = attrgetter(*_CONTACT_KEYS)
+
 class ContactManager:
     """Manages contacts and their connection information"""
     
@@ -23,6 +29,12 @@ class ContactManager:
             self.contacts_file = os.path.join(data_dir, "contacts.json")
             
         self.contacts: Dict[str, Contact] = self._load_contacts()
+        # Usernames are unique per contact list, so they index straight to the contact
+        self.contacts_by_username: Dict[str, Contact] = {c.username: c for c in self.contacts.values()}
+        # get_contacts_serialized result as (version it was built from, list), shared read-only.
+        # Saves bump _version, so a list built while a save was in progress is never served
+        self._version = 0
+        self._serialized: Optional[Tuple[int, List[Dict[str, Any]]]] = None
     
     def _load_contacts(self) -> Dict[str, Contact]:
         """Load contacts from file"""
@@ -38,6 +50,7 @@ class ContactManager:
     
     def _save_contacts(self):
         """Save contacts to file"""
+        self._version += 1  # every change to the contacts goes through here
         data = {uid: asdict(contact) for uid, contact in self.contacts.items()}
         with open(self.contacts_file, 'w') as f:
             json.dump(data, f, indent=2)
@@ -47,9 +60,8 @@ class ContactManager:
                    tunnel_url: str = None) -> bool:
         """Add a new contact"""
         # Check if contact already exists by username (more user-friendly)
-        for contact in self.contacts.values():
-            if contact.username == username:
-                return False
+        if username in self.contacts_by_username:
+            return False
         
         contact = Contact(
             user_id=contact_user_id,
@@ -63,27 +75,24 @@ class ContactManager:
         
         # Use contact_user_id as key for the contact
         self.contacts[contact_user_id] = contact
+        self.contacts_by_username[username] = contact
         self._save_contacts()
         return True
     
     def remove_contact(self, user_id: str) -> bool:
         """Remove a contact by user ID"""
         if user_id in self.contacts:
-            del self.contacts[user_id]
+            contact = self.contacts.pop(user_id)
+            self.contacts_by_username.pop(contact.username, None)
             self._save_contacts()
             return True
         return False
     
     def remove_contact_by_username(self, username: str) -> bool:
         """Remove a contact by username"""
-        contact_to_remove = None
-        for user_id, contact in self.contacts.items():
-            if contact.username == username:
-                contact_to_remove = user_id
-                break
-        
-        if contact_to_remove:
-            del self.contacts[contact_to_remove]
+        contact = self.contacts_by_username.pop(username, None)
+        if contact:
+            self.contacts.pop(contact.user_id, None)
             self._save_contacts()
             return True
         return False
@@ -92,10 +101,31 @@ class ContactManager:
         """Get a contact by user ID"""
         return self.contacts.get(user_id)
     
+    def get_by_username(self, username: str) -> Optional[Contact]:
+        """Get a contact by username"""
+        return self.contacts_by_username.get(username)
+    
     def list_contacts(self) -> List[Contact]:
         """Get all contacts for this user"""
         return list(self.contacts.values())
     
+    def get_contacts_serialized(self) -> List[Dict[str, Any]]:
+        """List all contacts as plain dicts; the list is cached, so don't modify it"""
+        version = self._version
+        cached = self._serialized
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        # Writes happen on worker threads; iterate a snapshot, never the live dict
+        serialized = [dict(zip(_CONTACT_KEYS, _CONTACT_FIELDS(c))) for c in list(self.contacts.values())]
+        self._serialized = (version, serialized)
+        return serialized
+    
+    def get_contacts_columns(self) -> Dict[str, List[Any]]:
+        """All contacts as one list per field, in the same order for every field"""
+        rows = list(map(_CONTACT_FIELDS, list(self.contacts.values())))
+        columns = list(zip(*rows)) if rows else [()] * len(_CONTACT_KEYS)
+        return {key: list(column) for key, column in zip(_CONTACT_KEYS, columns)}
+    
     def update_contact_last_seen(self, user_id: str):
         """Update last seen time for a contact"""
         if user_id in self.contacts:
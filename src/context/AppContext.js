@@ -559,24 +559,17 @@ export const AppProvider = ({ children }) => {
     }
   }, [executeCommand, addNotification]);
 
-  const checkPendingCalls = useCallback(async () => {
-    if (!user) return;
-
-    try {
-      const result = await executeCommand('get_pending_calls', {});
-      if (result.success && result.calls && result.calls.length > 0) {
-        setIncomingCalls(prev => {
-          // Add new calls, avoid duplicates
-          const newCalls = result.calls.filter(
-            newCall => !prev.some(existingCall => existingCall.call_id === newCall.call_id)
-          );
-          return [...prev, ...newCalls];
-        });
-      }
-    } catch (error) {
-      console.error('Failed to check pending calls:', error);
-    }
-  }, [executeCommand, user]);
+  const addIncomingCalls = useCallback((calls) => {
+    if (!calls || calls.length === 0) return;
+
+    setIncomingCalls(prev => {
+      // Add new calls, avoid duplicates
+      const newCalls = calls.filter(
+        newCall => !prev.some(existingCall => existingCall.call_id === newCall.call_id)
+      );
+      return [...prev, ...newCalls];
+    });
+  }, []);
 
   const loadActiveCalls = useCallback(async () => {
     if (!user) return;
@@ -599,17 +592,44 @@ export const AppProvider = ({ children }) => {
     }
   }, [executeCommand, user, activeCalls.length]);
 
-  // Poll for pending calls and active calls
+  // Incoming calls are pushed by the bridge; subscribing also returns calls that arrived earlier.
+  // A restarted bridge forgets the subscription, so subscribe again whenever it starts
+  useEffect(() => {
+    if (!user || !window.electronAPI?.onPythonEvent) return;
+
+    const subscribe = () => {
+      executeCommand('subscribe_events')
+        .then(result => {
+          if (result.success) {
+            addIncomingCalls(result.calls);
+          }
+        })
+        .catch(error => console.error('Failed to subscribe to call events:', error));
+    };
+
+    window.electronAPI.onPythonEvent((_event, message) => {
+      if (message.event === 'incoming_call') {
+        addIncomingCalls([message.call]);
+      } else if (message.event === 'bridge_started') {
+        subscribe();
+      }
+    });
+
+    subscribe();
+
+    return () => window.electronAPI.removeAllListeners('python-event');
+  }, [user, executeCommand, addIncomingCalls]);
+
+  // Poll for active calls
   useEffect(() => {
     if (!user) return;
 
     const interval = setInterval(() => {
-      checkPendingCalls();
       loadActiveCalls();
     }, 2000); // Check every 2 seconds
 
     return () => clearInterval(interval);
-  }, [user, checkPendingCalls, loadActiveCalls]);
+  }, [user, loadActiveCalls]);
 
   const value = {
     // State
@@ -124,9 +124,7 @@ class CryptoManager:
             except:
                 pass
         
-        # Mock encryption for demo
-        import base64
-        return base64.b64encode(f"{sender_private_key[:8]}:{message}".encode()).decode()
+        return self._mock_encrypt(sender_private_key, message)
     
     def decrypt_message(self, receiver_private_key: str, sender_public_key: str, encrypted_message: str) -> str:
         """Decrypt a received message"""
@@ -139,6 +137,39 @@ class CryptoManager:
             except:
                 pass
         
+        return self._mock_decrypt(encrypted_message)
+    
+    def precompute_box(self, private_key: str, public_key: str):
+        """Derive the shared key for a peer once; None when PyNaCl is unavailable"""
+        if ENCRYPTION_AVAILABLE:
+            try:
+                return Box(PrivateKey(private_key, encoder=self.encoder), PublicKey(public_key, encoder=self.encoder))
+            except:
+                pass
+        return None
+    
+    def encrypt_with_box(self, box, sender_private_key: str, message: str) -> str:
+        """Encrypt with a box from precompute_box; same output and fallback as encrypt_message"""
+        try:
+            return box.encrypt(message.encode()).decode('ascii')
+        except:
+            return self._mock_encrypt(sender_private_key, message)
+    
+    def decrypt_with_box(self, box, encrypted_message: str) -> str:
+        """Decrypt with a box from precompute_box; same fallback as decrypt_message"""
+        try:
+            return box.decrypt(encrypted_message.encode()).decode()
+        except:
+            return self._mock_decrypt(encrypted_message)
+    
+    @staticmethod
+    def _mock_encrypt(sender_private_key: str, message: str) -> str:
+        # Mock encryption for demo
+        import base64
+        return base64.b64encode(f"{sender_private_key[:8]}:{message}".encode()).decode()
+    
+    @staticmethod
+    def _mock_decrypt(encrypted_message: str) -> str:
         # Mock decryption for demo
         import base64
         try:
@@ -90,6 +90,18 @@ class GroupManager:
                 return True
         return False
     
+    def add_members_batch(self, group_id: str, member_ids: List[str]) -> List[str]:
+        """Add several members to a group with a single save; returns the ones added"""
+        group = self.groups.get(group_id)
+        if not group:
+            return []
+        existing = set(group.members)
+        added = [m for m in dict.fromkeys(member_ids) if m not in existing]
+        if added:
+            group.members.extend(added)
+            self._save_groups()
+        return added
+    
     def remove_member(self, group_id: str, member_id: str) -> bool:
         """Remove a member from a group"""
         group = self.groups.get(group_id)
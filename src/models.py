@@ -1,4 +1,5 @@
 from dataclasses import dataclass, asdict
+from functools import cached_property
 from typing import Optional, List
 
 @dataclass
@@ -22,6 +23,11 @@ class Contact:
     added_at: str = ""
     last_seen: Optional[str] = None
 
+    @cached_property
+    def short_id(self) -> str:
+        """Truncated user ID shown in contact listings"""
+        return self.user_id[:8]
+
 @dataclass
 class Connection:
     peer_id: str
@@ -31,8 +37,16 @@ class Connection:
     port: int
     status: str  # "connecting", "connected", "disconnected"
     established_at: Optional[str] = None
-    socket_obj: Optional[object] = None
+    reader: Optional[object] = None  # asyncio.StreamReader for TCP peers
+    writer: Optional[object] = None  # asyncio.StreamWriter for TCP peers
     websocket_obj: Optional[object] = None
+    box: Optional[object] = None  # crypto Box holding the shared key, derived once at handshake
+    framed: bool = False  # length-prefixed messages (peer protocol 2), agreed at handshake
+
+    @cached_property
+    def short_id(self) -> str:
+        """Truncated peer ID shown in connection listings"""
+        return self.peer_id[:8]
 
 @dataclass
 class Group:
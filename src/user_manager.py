@@ -1,6 +1,6 @@
 import os
 import json
-from typing import Dict, Optional
+from typing import Dict, Optional, Set
 from datetime import datetime
 from dataclasses import asdict
 
@@ -21,6 +21,7 @@ class UserManager:
         
         # Load existing users
         self.users: Dict[str, User] = self._load_users()
+        self.usernames: Set[str] = {user.username for user in self.users.values()}
     
     def _load_users(self) -> Dict[str, User]:
         """Load users from file"""
@@ -43,12 +44,11 @@ class UserManager:
     def register_user(self, username: str, password: str) -> str:
         """Register a new user and return their User ID"""
         import uuid # Moved here to avoid circular dependency with models
-        user_id = str(uuid.uuid4()).replace('-', '')
+        user_id = uuid.uuid4().hex
         
         # Check if username already exists
-        for user in self.users.values():
-            if user.username == username:
-                raise ValueError(f"Username '{username}' already exists")
+        if self.username_exists(username):
+            raise ValueError(f"Username '{username}' already exists")
         
         # Generate cryptographic keys
         private_key, public_key = self.crypto.generate_keypair()
@@ -67,10 +67,15 @@ class UserManager:
         )
         
         self.users[user_id] = user
+        self.usernames.add(username)
         self._save_users()
         
         return user_id
     
+    def username_exists(self, username: str) -> bool:
+        """Check whether a username is already registered"""
+        return username in self.usernames
+    
     def login(self, username: str, password: str) -> bool:
         """Login user with username and password"""
         for user in self.users.values():
@@ -35,6 +35,11 @@ class WebRTCManager:
             'call_ended': [],
             'call_error': []
         }
+        # Built ahead of the next call: constructing a peer connection generates its
+        # DTLS certificate, which is the slow part of setting up a call locally
+        self._spare_pc: Optional[RTCPeerConnection] = None
+        self._prewarm_task: Optional[asyncio.Task] = None  # the build in progress, if any
+        self._closed = False  # set by close(); a prewarm still queued must not build another
         
     def add_call_handler(self, event: str, handler: Callable):
         """Add a handler for call events"""
@@ -49,6 +54,39 @@ class WebRTCManager:
             except Exception as e:
                 logger.error(f"Error in call handler for {event}: {e}")
     
+    def prewarm(self):
+        """Start building a peer connection for the next call; must be called on the event loop"""
+        if self._spare_pc is not None or self._prewarm_task is not None or self._closed:
+            return
+        self._prewarm_task = asyncio.get_running_loop().create_task(self._build_spare())
+    
+    async def _build_spare(self):
+        try:
+            # Certificate generation is CPU work; keep it off the loop so calls and messages don't stall
+            pc = await asyncio.get_running_loop().run_in_executor(None, RTCPeerConnection)
+        finally:
+            self._prewarm_task = None
+        if self._closed or self._spare_pc is not None:
+            await pc.close()
+        else:
+            self._spare_pc = pc
+    
+    async def close(self):
+        """Release the pre-built peer connection; the manager builds no more after this"""
+        self._closed = True
+        building = self._prewarm_task
+        if building is not None:
+            await building  # sees _closed and closes what it built
+        pc, self._spare_pc = self._spare_pc, None
+        if pc is not None:
+            await pc.close()
+    
+    def _new_peer_connection(self) -> RTCPeerConnection:
+        """Take the pre-built peer connection and start building the next spare"""
+        pc, self._spare_pc = self._spare_pc, None
+        self.prewarm()
+        return pc or RTCPeerConnection()
+    
     async def start_call(self, peer_id: str, call_id: str) -> bool:
         """Initiate a voice call to a peer"""
         try:
@@ -57,7 +95,7 @@ class WebRTCManager:
             self.active_calls[call_id] = call
             
             # Create peer connection
-            pc = RTCPeerConnection()
+            pc = self._new_peer_connection()
             call.peer_connection = pc
             
             # Setup event handlers
@@ -80,8 +118,6 @@ class WebRTCManager:
             try:
                 # Create a simple audio track
                 # In production, you'd capture from actual microphone
-                # For now, we'll add a basic track
-                from aiortc.contrib.media import MediaBlackhole
                 
                 # Create offer
                 offer = await pc.createOffer()
@@ -225,7 +261,7 @@ class WebRTCManager:
             self.active_calls[call_id] = call
             
             # Create peer connection
-            pc = RTCPeerConnection()
+            pc = self._new_peer_connection()
             call.peer_connection = pc
             
             # Setup event handlers
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The modules import each other by bare name, as main.py and python_bridge.py arrange it
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'src'))
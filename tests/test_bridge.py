@@ -0,0 +1,64 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+import python_bridge
+from python_bridge import WhisperLinkBridge, _NOT_LOGGED_IN, _answer, _decode_line
+
+
+@pytest.fixture
+def bridge(tmp_path, monkeypatch):
+    # UserManager keeps its data under the working directory
+    monkeypatch.chdir(tmp_path)
+    return WhisperLinkBridge()
+
+
+@pytest.fixture
+def responses(monkeypatch):
+    stream = io.BytesIO()
+    monkeypatch.setattr(python_bridge, '_response_stream', stream)
+    monkeypatch.setattr(python_bridge, 'USE_MSGPACK', False)
+    return stream
+
+
+def _answer_lines(bridge, *lines: bytes):
+    """Answer each command line and return the decoded responses in the order they were written"""
+    async def go():
+        bridge._attach_loop(asyncio.get_running_loop())
+        await asyncio.gather(*(_answer(bridge, line, _decode_line) for line in lines))
+        await asyncio.sleep(0)  # let the queued flush run
+    asyncio.run(go())
+
+
+def _written(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_commands_need_login(bridge):
+    for command in ('get_contacts', 'add_contact', 'send_message'):
+        assert asyncio.run(bridge.handle_command(command, {})) == _NOT_LOGGED_IN
+
+
+def test_unknown_command(bridge):
+    response = asyncio.run(bridge.handle_command('no_such_command', {}))
+    assert response == {'success': False, 'error': 'Unknown command: no_such_command'}
+
+
+def test_answer_echoes_command_id(bridge, responses):
+    _answer_lines(bridge,
+                  b'{"command":"get_contacts","args":{},"command_id":7}\n',
+                  b'{"command":"ping","command_id":"p1"}\n',
+                  b'{"command":"add_contact","args":{},"command_id":8}\n')
+    by_id = {r['command_id']: r for r in _written(responses)}
+    assert by_id[7] == {**_NOT_LOGGED_IN, 'command_id': 7}
+    assert by_id['p1'] == {'success': True, 'message': 'pong', 'command_id': 'p1'}
+    assert by_id[8] == {**_NOT_LOGGED_IN, 'command_id': 8}
+    # The shared response must not have been tagged in place
+    assert 'command_id' not in _NOT_LOGGED_IN
+
+
+def test_answer_without_command_id(bridge, responses):
+    _answer_lines(bridge, b'{"command":"get_contacts","args":{}}\n', b'not json\n')
+    assert _written(responses) == [_NOT_LOGGED_IN, {'success': False, 'error': 'Invalid JSON'}]
@@ -0,0 +1,24 @@
+from contact_manager import ContactManager
+
+
+def test_serialized_contacts_are_cached_until_saved(tmp_path):
+    manager = ContactManager(str(tmp_path), 'owner')
+    assert manager.get_contacts_serialized() == []
+
+    assert manager.add_contact('id-1', 'alice', 'key-1', address='127.0.0.1:9001')
+    first = manager.get_contacts_serialized()
+    assert [c['username'] for c in first] == ['alice']
+    assert manager.get_contacts_serialized() is first
+
+    manager.add_contact('id-2', 'bob', 'key-2')
+    second = manager.get_contacts_serialized()
+    assert second is not first
+    assert [c['username'] for c in second] == ['alice', 'bob']
+
+    manager.update_contact_last_seen('id-1')
+    third = manager.get_contacts_serialized()
+    assert third is not second
+    assert third[0]['last_seen'] is not None
+
+    manager.remove_contact_by_username('alice')
+    assert [c['username'] for c in manager.get_contacts_serialized()] == ['bob']
@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+import pytest
+
+from connection_manager import (MAX_PEER_FRAME, PEER_PROTOCOL, _FRAME_HEADER, _decode_json_messages,
+                                _frame, _read_frame, _read_handshake)
+
+
+def _run_with_reader(data: bytes, read):
+    """Feed `data` to a fresh StreamReader and run `read(reader)` on it"""
+    async def go():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await read(reader)
+    return asyncio.run(go())
+
+
+def test_frame_round_trip():
+    payloads = [b'{"type":"chat","message":"hi"}', b'', b'x' * 70000]
+
+    async def read_all(reader):
+        frames = [await _read_frame(reader) for _ in payloads]
+        with pytest.raises(asyncio.IncompleteReadError):
+            await _read_frame(reader)
+        return frames
+
+    assert _run_with_reader(b''.join(map(_frame, payloads)), read_all) == payloads
+
+
+def test_frame_over_limit_is_rejected():
+    header = _FRAME_HEADER.pack(MAX_PEER_FRAME + 1)
+    with pytest.raises(ValueError):
+        _run_with_reader(header, _read_frame)
+
+
+def test_handshake_protocol_1_is_bare_json():
+    # Protocol 1 peers send the handshake as one bare JSON write and never advertise a version
+    handshake = {'type': 'handshake', 'user_id': 'a', 'username': 'alice'}
+    message, framed = _run_with_reader(json.dumps(handshake).encode(), _read_handshake)
+    assert message == handshake
+    assert framed is False
+
+
+def test_handshake_protocol_2_is_framed():
+    handshake = {'type': 'handshake', 'user_id': 'a', 'username': 'alice', 'protocol': PEER_PROTOCOL}
+    after = _frame(b'{"type":"chat"}')
+
+    async def read(reader):
+        return await _read_handshake(reader), await _read_frame(reader)
+
+    (message, framed), next_frame = _run_with_reader(_frame(json.dumps(handshake).encode()) + after, read)
+    assert message == handshake
+    assert framed is True
+    assert next_frame == b'{"type":"chat"}'
+
+
+def test_protocol_1_messages_sent_back_to_back():
+    data = b'{"type":"chat","n":1}{"type":"chat","n":2}\n{"type":"chat","n":3}'
+    assert [m['n'] for m in _decode_json_messages(data)] == [1, 2, 3]